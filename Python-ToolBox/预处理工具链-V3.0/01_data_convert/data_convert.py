@@ -1,20 +1,31 @@
 import pandas as pd
-import numpy as np
-import mne
 import os
+import tempfile
+from pathlib import Path
 from scipy.io import savemat
 
-def edf_to_csv(edf_path, output_path=None):
-    """edf转csv"""
+import xmuse  # 纯numpy的EDF读取器，按数据记录分块读
+
+def edf_to_csv(edf_path, output_path=None, chunk_sec=300):
+    """edf转csv：调用xmuse.edf_to_csv，每次读chunk_sec秒的数据记录并追加写出，不把整个文件载入内存（数值与mne的to_data_frame一致）"""
     if not output_path:
         output_path = os.path.splitext(edf_path)[0] + '.csv'
-    
-    raw = mne.io.read_raw_edf(edf_path, preload=True, verbose=False)
-    raw.to_data_frame().to_csv(output_path, index=False)
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    file_name = os.path.splitext(os.path.basename(edf_path))[0] + '.csv'
+    if os.path.basename(output_path) == file_name:
+        xmuse.edf_to_csv(Path(edf_path), Path(output_dir), 'csv', chunk_sec)
+    else:
+        # 工具包按EDF文件名命名输出，换名时先写到临时目录再移过去，不覆盖输出目录里的同名文件
+        with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+            xmuse.edf_to_csv(Path(edf_path), Path(tmp_dir), 'csv', chunk_sec)
+            os.replace(os.path.join(tmp_dir, file_name), output_path)
     print(f"转换完成: {edf_path} -> {output_path}")
 
 def csv_to_mne_raw(csv_path, sfreq, ch_names, ch_types='eeg'):
     """csv转mne的Raw对象"""
+    import mne
+
     df = pd.read_csv(csv_path)
     data_volts = df[ch_names].values.T * 1e-6 # .T转置，数值单位μv转换为v
     
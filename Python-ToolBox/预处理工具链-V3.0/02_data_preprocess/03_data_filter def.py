@@ -1,26 +1,26 @@
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt
+from scipy.signal import butter, sosfiltfilt
 import os
 
-# 滤波器函数，最好不要改会出错
+# 滤波器函数，使用二阶节(SOS)形式，低截止频率(如0.5Hz高通)时比(b, a)形式数值稳定
 def highpass_filter(data, cutoff, fs, order=5):
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype='high', analog=False)
-    return filtfilt(b, a, data)
+    sos = butter(order, normal_cutoff, btype='high', analog=False, output='sos')
+    return sosfiltfilt(sos, data)
 
 def lowpass_filter(data, cutoff, fs, order=5):
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    return filtfilt(b, a, data)
+    sos = butter(order, normal_cutoff, btype='low', analog=False, output='sos')
+    return sosfiltfilt(sos, data)
 
 def notch_50hz_filter(data, fs, order=5):
     nyq = 0.5 * fs
     low, high = 49 / nyq, 51 / nyq
-    b, a = butter(order, [low, high], btype='bandstop')
-    return filtfilt(b, a, data)
+    sos = butter(order, [low, high], btype='bandstop', output='sos')
+    return sosfiltfilt(sos, data)
 
 
 # ---Main----
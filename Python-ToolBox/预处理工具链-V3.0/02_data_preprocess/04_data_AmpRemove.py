@@ -1,34 +1,10 @@
 import pandas as pd
-import numpy as np
 import os
-from typing import Tuple
 
-def interpolate_outliers(df: pd.DataFrame, threshold: float) -> Tuple[pd.DataFrame, int]:
-    """
-    功能: 在给定的表中检测并插值超过阈值的点
-    """
-    eeg_channels = ['CH1', 'CH2', 'CH3', 'CH4']
-    total_interpolated_count = 0
+from xmuse import interpolate_outliers  # 整个通道矩阵一次比较，np.interp修复
 
-    for chan in eeg_channels:
-        if chan not in df.columns:
-            continue
-        signal = df[chan]
-        # 找到绝对值超过阈值的坏点
-        bad_indices = np.abs(signal) > threshold
-        bad_points_count = bad_indices.sum()
-
-        if bad_points_count > 0:
-            print(f"{chan}找到{bad_points_count}个极值点插值...")
-            total_interpolated_count += bad_points_count
-            
-            # 坏点NaN，线性插值填充
-            signal[bad_indices] = np.nan
-            df[chan] = signal.interpolate(method='linear', limit_direction='both')
-        else:
-            print(f"{chan}无坏点")
-            
-    return df, total_interpolated_count
+# interpolate_outliers返回: 插值后的表、每个通道的坏点数、坏点掩码
+EEG_CHANNELS = ['CH1', 'CH2', 'CH3', 'CH4']
 
 
 # ---Main---
@@ -47,7 +23,9 @@ for file_path in files_to_process:
         continue
 
     df = pd.read_csv(file_path)
-    df_interpolated, num_fixed = interpolate_outliers(df, AMPLITUDE_THRESHOLD)
+    df_interpolated, bad_counts, _ = interpolate_outliers(df, EEG_CHANNELS, AMPLITUDE_THRESHOLD)
+    num_fixed = sum(bad_counts.values())
+    print(f"{file_path} 极值点: " + ", ".join(f"{chan} {count}" for chan, count in bad_counts.items()) + f"，共{num_fixed}个已插值")
     
     # 有修改就保存为带后缀的新csv
     if num_fixed > 0:
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import os
 
+from xmuse import find_table, read_table  # 自动识别csv/parquet/npz/hdf5
+
 # --- epoch函数 ---
 
 def create_epochs(df, fs, window_sec=1.0, overlap_rate=0.0):
@@ -58,12 +60,12 @@ OVERLAP_RATE = 0.5  # 重叠程度（0.0为不重叠，0.5为重叠一半）
 print(f"开始进行数据分段 (分段间重叠: {OVERLAP_RATE*100}%)...")
 
 for file_path in files_to_process:
-    if not os.path.exists(file_path):
+    if find_table(file_path) is None:
         print(f"\n文件 '{file_path}' 不存在，跳过。")
         continue
 
     print(f"\n正在处理: {file_path}")
-    df = pd.read_csv(file_path)
+    df = read_table(file_path)
 
     # 从时间列重新计算采样率
     fs = 1 / np.mean(np.diff(df['time']))
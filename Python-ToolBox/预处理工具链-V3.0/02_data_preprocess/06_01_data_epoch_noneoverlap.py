@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import os
 
+from xmuse import read_table  # 自动识别csv/parquet/npz/hdf5
+
 # --- epoch函数 ---
 
 def create_epochs(df, fs, window_sec=1.0):
@@ -43,7 +45,7 @@ for file_path in files_to_process:
     #     continue
 
     print(f"\n正在处理: {file_path}")
-    df = pd.read_csv(file_path)
+    df = read_table(file_path)
 
     # 从时间列重新计算采样率
     fs = 1 / np.mean(np.diff(df['time']))
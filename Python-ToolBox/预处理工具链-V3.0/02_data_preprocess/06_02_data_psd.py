@@ -7,20 +7,29 @@ import numpy as np
 from scipy.signal import welch
 import os
 
-def calc_psd(df, channels, fs):
-    """计算平均功率谱(PSD)"""
+from xmuse import find_table, read_table, gap_index, sampling_rate_of  # 自动识别csv/parquet/npz/hdf5
+
+def calc_psd(df, channels, fs, segments=None):
+    """计算平均功率谱(PSD)，有断点时每段连续数据单独做welch，再按段长加权平均"""
     all_powers = []
     freqs = None
     win_samples = int(2 * fs)
+    if segments is None:
+        segments = [(0, len(df))]
 
     for chan in channels:
         if chan in df.columns:
-            data = df[chan].dropna()
-            if len(data) >= win_samples:
-                f, p = welch(data, fs, nperseg=win_samples)
-                if freqs is None:
-                    freqs = f
-                all_powers.append(p)
+            seg_powers, seg_weights = [], []
+            for start, stop in segments:
+                data = df[chan].iloc[start:stop].dropna().to_numpy()
+                if len(data) >= win_samples:
+                    f, p = welch(data, fs, nperseg=win_samples)
+                    if freqs is None:
+                        freqs = f
+                    seg_powers.append(p)
+                    seg_weights.append(len(data))
+            if seg_powers:
+                all_powers.append(np.average(seg_powers, axis=0, weights=seg_weights))
             
     if not all_powers:
         return None, None
@@ -63,10 +72,11 @@ BANDS_TO_EXTRACT = ['Delta', 'Theta', 'Alpha', 'Beta1', 'Beta2']
 print("开始处理PSD...")
 
 for file in files:
-    df = pd.read_csv(file)
-    fs = 1 / np.mean(np.diff(df['time']))
+    df = read_table(file)
+    segments = gap_index(df['time'].to_numpy())  # 蓝牙丢包造成的断点，welch窗口不跨断点
+    fs = sampling_rate_of(df['time'].to_numpy(), segments)
     
-    freqs, psd = calc_psd(df, CHANNELS, fs)
+    freqs, psd = calc_psd(df, CHANNELS, fs, segments)
     
     # 将选择的频带列表和总菜单都传入函数
     band_powers = get_band_powers(freqs, psd, BANDS_TO_EXTRACT, ALL_BANDS)
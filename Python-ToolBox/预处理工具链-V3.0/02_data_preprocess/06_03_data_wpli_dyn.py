@@ -8,6 +8,8 @@ from scipy.signal import butter, filtfilt, hilbert
 from itertools import combinations
 import os
 
+from xmuse import find_table, read_table, gap_index, sampling_rate_of  # 自动识别csv/parquet/npz/hdf5
+
 def bandpass_filter(data, low, high, fs):
     """对信号进行带通滤波"""
     nyq = 0.5 * fs
@@ -57,15 +59,17 @@ print("开始处理动态wPLI...")
 
 for file in files:
     # 直接执行，不作任何检查
-    df = pd.read_csv(file)
-    fs = 1 / np.mean(np.diff(df['time']))
+    df = read_table(file)
+    segments = gap_index(df['time'].to_numpy())  # 滑动窗在每段连续数据内移动，不跨断点
+    fs = sampling_rate_of(df['time'].to_numpy(), segments)
     
     win_samples = int(WIN_SEC * fs)
     step_samples = int(STEP_SEC * fs)
     
     all_results = []
+    starts = [i for seg_start, seg_stop in segments for i in range(seg_start, seg_stop - win_samples + 1, step_samples)]
     
-    for i in range(0, len(df) - win_samples + 1, step_samples):
+    for i in starts:
         window_df = df.iloc[i : i + win_samples]
         
         wpli_pairs = calc_wpli_pairs(window_df, CHANNELS, fs, BAND)
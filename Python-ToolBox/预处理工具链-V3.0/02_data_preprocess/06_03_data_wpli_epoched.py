@@ -12,6 +12,8 @@ from scipy.signal import butter, filtfilt, hilbert
 from itertools import combinations
 import os
 
+from xmuse import Epochs, read_table  # Epochs: 分段数据的(epochs, samples, channels)容器
+
 def bandpass_filter(data, low, high, fs):
     """对信号进行带通滤波"""
     nyq = 0.5 * fs
@@ -59,12 +61,13 @@ BAND = (8, 12) # Alpha 频带
 print("开始处理分段数据的wPLI...")
 
 for file in files:
-    df = pd.read_csv(file)
+    df = read_table(file)
     fs = 1 / np.mean(np.diff(df['time'].unique()))
+    epochs = Epochs.from_frame(df, fs) # 不再按epoch_id分组，直接还原为三维数组
     
     all_results = []
     
-    for epoch_id, epoch_df in df.groupby('epoch_id'):
+    for epoch_id, epoch_df in epochs.iter_frames():
         wpli_pairs = calc_wpli_pairs(epoch_df, CHANNELS, fs, BAND)
         avg_wpli = calc_wpli_avg(wpli_pairs)
         
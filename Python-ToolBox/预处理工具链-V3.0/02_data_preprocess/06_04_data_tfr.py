@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 import os
+
+from xmuse import find_table, read_table, gap_index, sampling_rate_of  # 自动识别csv/parquet/npz/hdf5
 import mne
 
 def calc_tfr_avg(df, channels, fs):
@@ -73,18 +75,33 @@ print("开始处理时频分析...")
 
 for file in files:
     print(f"\n处理: {os.path.basename(file)}")
-    df = pd.read_csv(file)
-    fs = 1 / np.mean(np.diff(df['time']))
+    df = read_table(file)
+    segments = gap_index(df['time'].to_numpy())
+    fs = sampling_rate_of(df['time'].to_numpy(), segments)
     
     # 在下面两种方法中选择一种（取消您想用的那一种的注释）
     # # 方法1: 计算所有通道的平均时频能量 (默认启用)
-    # freqs, times, power = calc_tfr_avg(df, CHANNELS, fs)
+    # calc_tfr = lambda seg: calc_tfr_avg(seg, CHANNELS, fs)
     # out_path = f"{os.path.splitext(file)[0]}_tfr_avg.csv"
     
     #方法2: 只计算单个指定通道的时频能量
-    freqs, times, power = calc_tfr_single(df, CHANNEL_TO_ANALYZE, fs)
+    calc_tfr = lambda seg: calc_tfr_single(seg, CHANNEL_TO_ANALYZE, fs)
     out_path = f"{os.path.splitext(file)[0]}_tfr_{CHANNEL_TO_ANALYZE}.csv"
 
+    # 小波变换在每段连续数据内单独做，不跨断点；结果按时间拼接（断点处没有列）
+    parts = []
+    for start, stop in segments:
+        try:
+            parts.append(calc_tfr(df.iloc[start:stop]))
+        except ValueError as exc:  # 段长短于最长的小波
+            print(f"  跳过 {stop - start} 个样本的短段: {exc}")
+    if not parts:
+        print("  跳过该文件: 没有长于最长小波的连续数据段")
+        continue
+    freqs = parts[0][0]
+    times = np.concatenate([part[1] for part in parts])
+    power = np.concatenate([part[2] for part in parts], axis=-1)
+
     # --- 保存结果 ---
     # 将2D能量矩阵转换为DataFrame，行是频率，列是时间
     results_df = pd.DataFrame(power, index=freqs, columns=times)
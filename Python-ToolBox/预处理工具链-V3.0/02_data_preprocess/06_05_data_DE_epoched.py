@@ -12,47 +12,12 @@ DE微分熵：情感计算和认知状态识别等深度学习任务中非常有
 """
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt
 import os
 
-# --- 核心算法函数 ---
+from xmuse import Epochs, de_features, find_table, read_table  # Epochs: 分段数据的(epochs, samples, channels)容器
 
-def bandpass_filter(data, low, high, fs):
-    """对信号进行带通滤波"""
-    nyq = 0.5 * fs
-    # 增加对数据长度的检查，防止数据过短导致滤波报错
-    if len(data) <= 3 * 5:  # 5是滤波阶数
-        return np.zeros_like(data)
-    b, a = butter(5, [low/nyq, high/nyq], btype='band')
-    return filtfilt(b, a, data)
-
-def calculate_de(signal):
-    """
-    计算微分熵 (Differential Entropy)
-    假设信号服从高斯分布，公式为: 1/2 * log(2 * pi * e * sigma^2)
-    """
-    var = np.var(signal, ddof=1)
-    if var <= 0:
-        return 0
-    return 0.5 * np.log(2 * np.pi * np.exp(1) * var)
-
-def calc_de_features(epoch_df, channels, fs, bands):
-    """计算单个Epoch中所有通道在各个频带的DE值"""
-    de_results = {}
-    
-    for chan in channels:
-        if chan in epoch_df.columns and not epoch_df[chan].isnull().all():
-            raw_signal = epoch_df[chan].dropna().values
-            
-            for band_name, (low, high) in bands.items():
-                # 1. 频段滤波
-                filtered_data = bandpass_filter(raw_signal, low, high, fs)
-                # 2. 计算该频段下的 DE
-                de_val = calculate_de(filtered_data)
-                # 3. 存储特征，格式如: CH1_alpha
-                de_results[f'{chan}_{band_name}'] = de_val
-                
-    return de_results
+# DE计算在xmuse.features.de_matrix里：每个频段对所有epoch和通道一起做一次滤波，再按批计算方差和DE，
+# 默认(USE_SOS = False)结果与原来逐个epoch×通道×频段调用butter+filtfilt完全相同（python xmuse_bench.py de 对比两者）
 
 # --- Main ---
 
@@ -61,6 +26,10 @@ files = [
     'Qinghui_Athena_cleaned_filtered_remove_epoched.csv',
     'Qinghui_S_cleaned_filtered_remove_epoched.csv',
 ]
+# 也可以按记录目录库筛选（只查output/catalog.sqlite，不打开原始数据），例如时长超过20分钟且CH1极值点少于1%的记录：
+# from xmuse import catalog_files
+# files = [f"{os.path.splitext(name)[0]}_cleaned_filtered_remove_epoched.csv"
+#          for name in catalog_files(["duration_sec>1200", "CH1.outlier_frac<0.01"], directory="data/02")]
 
 CHANNELS = ['CH1', 'CH2', 'CH3', 'CH4']
 
@@ -72,34 +41,29 @@ BANDS = {
     'beta': (13, 30),
     'gamma': (30, 45)
 }
+
+# False: 与原脚本相同的(b, a)形式带通滤波器，输出与原来的*_DE.csv逐字节相同
+# True: 改用二阶节(sos)形式。256 Hz时1-4 Hz的delta带通在(b, a)形式下有一个极点落在单位圆外，
+# 改用sos后delta的DE最多变化约0.7（theta约1e-4，其他频段<1e-6），与旧结果不再相同，见README“DE特征”
+USE_SOS = False
 # --- 配置结束 ---
 
 print("开始处理分段数据的微分熵 (DE)...")
 
 for file in files:
-    if not os.path.exists(file):
+    if find_table(file) is None:
         print(f"跳过不存在的文件: {file}")
         continue
         
-    df = pd.read_csv(file)
+    df = read_table(file)
     # 从分段数据的时间列重新获取采样率 (取前两个点的差值即可)
     sample_times = df['time'].unique()
     fs = 1 / np.mean(np.diff(sample_times))
-    
-    all_results = []
-    
-    # 按照 epoch_id 遍历每一段数据
-    for epoch_id, epoch_df in df.groupby('epoch_id'):
-        # 计算该 Epoch 下的所有通道、所有频段的 DE
-        de_features = calc_de_features(epoch_df, CHANNELS, fs, BANDS)
-        
-        current_result = {'epoch_id': epoch_id}
-        current_result.update(de_features)
-        all_results.append(current_result)
+    epochs = Epochs.from_frame(df, fs) # 不再按epoch_id分组，直接还原为三维数组
+
+    # 所有epoch一次计算：每行一个epoch，列为 通道_频段
+    results_df = de_features(epochs, CHANNELS, BANDS, order=5, sos=USE_SOS)
 
-    # 转化为 DataFrame
-    results_df = pd.DataFrame(all_results)
-    
     # 保存结果
     out_path = f"{os.path.splitext(file)[0]}_DE.csv"
     results_df.to_csv(out_path, index=False)
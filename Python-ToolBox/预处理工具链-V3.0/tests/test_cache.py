@@ -0,0 +1,37 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+import xmuse as xt
+
+
+def test_entry_round_trip(tmp_path: Path) -> None:
+    cache = xt.StageCache(tmp_path)
+    data = np.arange(12, dtype=np.float32).reshape(6, 2)
+    segments = np.array([[0, 4], [4, 6]], dtype=np.intp)
+    rec = xt.Recording(data, np.arange(6) / 256.0, 256.0, ["CH1", "CH2"], [{"stage": "clean", "dropped_rows": 1}], segments)
+    cache.put("k", rec, {"fs": 256.0, "fixed_count": 3, "outlier_counts": {"CH1": 3, "CH2": 0}})
+
+    cached, meta = cache.get("k")
+    np.testing.assert_array_equal(cached.data, data)
+    assert cached.data.dtype == np.float32
+    np.testing.assert_array_equal(cached.segments, segments)
+    assert (cached.fs, cached.channels, cached.log) == (256.0, ["CH1", "CH2"], rec.log)
+    assert meta == {"fs": 256.0, "fixed_count": 3, "outlier_counts": {"CH1": 3, "CH2": 0}}
+    assert [path.suffix for path in tmp_path.iterdir()] == [".npz"]
+
+
+def test_source_key_follows_size_and_mtime(tmp_path: Path) -> None:
+    source = tmp_path / "raw.csv"
+    source.write_text("time,eeg_1\n0,1\n", encoding="utf-8")
+    cache = xt.StageCache(tmp_path / "cache")
+    key = cache.source_key(source)
+    assert cache.source_key(source) == key
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.source_key(source) != key
+
+    hashed = xt.StageCache(tmp_path / "cache", content_hash=True)
+    assert hashed.source_key(source) == f"sha256:{xt.file_digest(source)}"
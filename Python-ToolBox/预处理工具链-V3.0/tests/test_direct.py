@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import xmuse as xt
+import xmuse.direct
+
+BLOCK = (
+    b'1.5,EEG,"1.25,-2.5,3e2"\n'
+    b'1.5,PPG,"10,20"\n'
+    b'2.5,EEG,"4.0,5.0,6.0"\n'
+)
+
+
+@pytest.fixture
+def slow_calls(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Counts the rows handed to the line-by-line fallback parser."""
+    calls: list[int] = []
+    slow = xmuse.direct._parse_direct_rows_slow
+
+    def counting(buf: bytes, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        calls.append(len(starts))
+        return slow(buf, starts, ends)
+
+    monkeypatch.setattr(xmuse.direct, "_parse_direct_rows_slow", counting)
+    return calls
+
+
+def test_parse_direct_block(slow_calls: list[int]) -> None:
+    packets = xt.parse_direct_block(BLOCK)
+    np.testing.assert_array_equal(packets["EEG"][0], [1.5, 2.5])
+    np.testing.assert_array_equal(packets["EEG"][1], [[1.25, -2.5, 300.0], [4.0, 5.0, 6.0]])
+    np.testing.assert_array_equal(packets["PPG"][1], [[10.0, 20.0]])
+    assert slow_calls == []
+
+
+def test_truncated_final_row_is_padded(slow_calls: list[int]) -> None:
+    """A file cut mid-row without a newline: the short row is padded with NaN on the fast path."""
+    packets = xt.parse_direct_block(BLOCK + b'3.5,EEG,"7.0,8')
+    np.testing.assert_array_equal(packets["EEG"][1][-1], [7.0, 8.0, np.nan])
+    np.testing.assert_array_equal(packets["EEG"][1][:2], [[1.25, -2.5, 300.0], [4.0, 5.0, 6.0]])
+    assert slow_calls == []
+
+
+def test_malformed_final_row_uses_fallback(slow_calls: list[int]) -> None:
+    """A value that is not a number sends the block to the slow parser, which makes it NaN."""
+    packets = xt.parse_direct_block(BLOCK + b'3.5,EEG,"7.0,8.x,9.0"\n')
+    np.testing.assert_array_equal(packets["EEG"][1][-1], [7.0, np.nan, 9.0])
+    np.testing.assert_array_equal(packets["EEG"][1][:2], [[1.25, -2.5, 300.0], [4.0, 5.0, 6.0]])
+    np.testing.assert_array_equal(packets["PPG"][1], [[10.0, 20.0]])
+    assert sum(slow_calls) == 4
+
+
+def test_values_match_float() -> None:
+    values = ["0.1", "1755000000000000", "-3.3333333333333335", "825.1460442186786", "1e-7"]
+    block = f'1,EEG,"{",".join(values)}"\n'.encode()
+    np.testing.assert_array_equal(xt.parse_direct_block(block)["EEG"][1][0], [float(v) for v in values])
@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import xmuse as xt
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def convert(name: str, out_dir: Path, chunk_sec: float) -> pd.DataFrame:
+    xt.edf_to_csv(ROOT / "data" / "01" / f"{name}.edf", out_dir, "csv", chunk_sec)
+    return pd.read_csv(out_dir / f"{name}.csv")
+
+
+@pytest.mark.parametrize("name", ["exp1", "exp2"])
+@pytest.mark.parametrize("chunk_sec", [1.0, 5.0, 0.0])
+def test_edf_matches_mne_output(tmp_path: Path, name: str, chunk_sec: float) -> None:
+    """Every block size reproduces the committed mne conversion, aux channels included."""
+    expected = pd.read_csv(ROOT / "output" / "convert" / f"{name}.csv")
+    result = convert(name, tmp_path, chunk_sec)
+    assert list(result.columns) == list(expected.columns)
+    assert result.shape == expected.shape
+    scale = np.maximum(expected.abs().max().to_numpy(), 1.0)
+    assert (np.abs(result.to_numpy() - expected.to_numpy()) / scale).max() < 1e-12
+
+
+def test_edf_blocks_do_not_change_output(tmp_path: Path) -> None:
+    (tmp_path / "whole").mkdir()
+    (tmp_path / "blocked").mkdir()
+    whole = convert("exp2", tmp_path / "whole", 0.0)
+    blocked = convert("exp2", tmp_path / "blocked", 5.0)
+    pd.testing.assert_frame_equal(whole, blocked, check_exact=True)
@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+import xmuse as xt
+
+
+def timing_rows(file_name: str) -> list[dict]:
+    return [
+        {"file": file_name, "stage": stage, "samples": 100, "wall_s": 0.5, "cpu_s": 0.25}
+        for stage in ("read", "filter")
+    ]
+
+
+def test_batch_timings_share_one_report(tmp_path: Path) -> None:
+    results = {"a.csv": {"timings": timing_rows("a.csv")}, "b.csv": {"timings": timing_rows("b.csv")}, "c.csv": None}
+    paths = xt.write_stage_timings(results, tmp_path)
+    assert paths == [tmp_path / "stage_timings.json"]
+    assert len(pd.read_csv(tmp_path / "stage_timings.csv", encoding="utf-8-sig")) == 4
+    report = json.loads(paths[0].read_text(encoding="utf-8"))
+    assert report["stages"]["filter"] == {"wall_s": 1.0, "cpu_s": 0.5, "samples": 200}
+
+
+def test_job_timings_are_written_per_file(tmp_path: Path) -> None:
+    """Jobs of serve/watch run concurrently: each file gets its own report, none is shared."""
+    for name in ("a.csv", "b.csv"):
+        xt.write_stage_timings({name: {"timings": timing_rows(name)}}, tmp_path, per_file=True)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "a_stage_timings.csv",
+        "a_stage_timings.json",
+        "b_stage_timings.csv",
+        "b_stage_timings.json",
+    ]
+    assert set(pd.read_csv(tmp_path / "b_stage_timings.csv", encoding="utf-8-sig")["file"]) == {"b.csv"}
@@ -0,0 +1,43 @@
+"""XMuse EEG preprocessing toolkit: the library behind ``xmuse_toolkit.py``.
+参数位于config.json文件中，各子模块对应预处理工具链的一个部分
+"""
+
+from __future__ import annotations
+
+from .config import DEFAULT_CONFIG, ROOT, ensure_dir, load_config, project_path
+from .tables import (
+    PRECISIONS, TABLE_SUFFIXES, TableAppender, file_digest, find_table, iter_table_chunks, raw_csv_dtypes, read_raw_csv,
+    read_table, sample_dtype, write_csv_atomic, write_table,
+)
+from .recording import (
+    GAP_FACTOR, Epochs, Recording, estimate_sampling_rate, gap_index, gap_stats, get_sampling_rate, sampling_rate_of,
+)
+from .stages import (
+    apply_baseline, apply_filters, clean_eeg_frame, create_epochs, filter_chain, interpolate_outliers, map_segments,
+    resample_uniform, resolve_workers, scale_channels,
+)
+from .reports import StageTimer, peak_rss_mb, write_quality_summary, write_stage_timings
+from .edf import EDF_ANNOTATIONS, EDF_READERS, EDF_SIGNAL_FIELDS, EDF_UNITS_V, EdfReader, edf_to_csv
+from .store import (
+    STORE_SUFFIX, STORE_VERSION, RecordingStore, ingest_csv, ingest_edf, is_store, open_store, resolve_store_dir,
+    store_path,
+)
+from .cache import CACHE_VERSION, StageCache, resolve_cache
+from .features import DE_BANDS, PSD_BANDS, de_features, de_matrix, psd_features, tfr_features, wpli_features
+from .pipeline import (
+    ARRAY_STAGES, FEATURE_STAGES, PipelineNode, build_pipeline, default_pipeline, describe_pipeline, pipeline_chains,
+    preprocess_file, preprocess_stage_params, run_pipeline, run_preprocess_stages, run_stage_chain, stage_defaults,
+)
+from .stream import preprocess_file_streaming
+from .direct import (
+    DIRECT_CHUNK_MB, DIRECT_HEADER, DirectScan, direct_frame, iter_direct_blocks, organize_direct_csv,
+    parse_direct_block, read_direct_csv, split_direct_block,
+)
+from .catalog import (
+    CATALOG_CHANNEL_COLUMNS, CATALOG_FILE_COLUMNS, Catalog, catalog_entry, catalog_files, resolve_catalog_path,
+    run_catalog, store_entry, update_catalog,
+)
+from .mat import MAT_FORMATS, MAT_PLATFORMS, csv_to_mat, matlab_names
+from .batch import FileTask, resolve_jobs, run_convert, run_direct_data, run_file_tasks, run_ingest, run_preprocess
+from .serve import JOB_COMMANDS, JobServer, job_config, run_job, run_serve
+from .watch import FileLedger, run_watch, settled_files
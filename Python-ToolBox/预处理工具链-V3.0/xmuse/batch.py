@@ -0,0 +1,260 @@
+"""Batch runners of the toolkit commands."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+
+from .cache import resolve_cache
+from .catalog import update_catalog
+from .config import ensure_dir, project_path
+from .direct import DIRECT_CHUNK_MB, organize_direct_csv
+from .edf import edf_to_csv
+from .mat import csv_to_mat
+from .pipeline import build_pipeline, describe_pipeline, preprocess_file
+from .reports import write_stage_timings
+from .store import _current_store, ingest_csv, ingest_edf, resolve_store_dir, store_path
+from .stream import preprocess_file_streaming
+from .tables import sample_dtype
+
+
+# ---Batch runner---
+# 每个文件是一个独立任务：jobs>1时放进进程池，单个文件出错只记录失败，不中断整批
+
+
+FileTask = tuple[str, str, Callable[..., None], tuple[Any, ...]]
+
+
+def resolve_jobs(config: dict[str, Any], jobs: int | None = None) -> int:
+    """CLI ``--jobs`` wins over the ``jobs`` config key; 0 or less means one worker per CPU."""
+    value = int(jobs if jobs is not None else config.get("jobs", 1))
+    return value if value > 0 else (os.cpu_count() or 1)
+
+
+def _run_task(file_name: str, func: Callable[..., Any], args: tuple[Any, ...]) -> tuple[str, Any]:
+    """Run one file job and return ``(error message, result)``; the message is "" on success."""
+    try:
+        result = func(*args)
+    except ImportError as exc:
+        print(f"[warn] {exc}; skipped {file_name}")
+        return str(exc), None
+    except Exception as exc:  # one bad file must not abort the batch
+        print(f"[error] {file_name}: {type(exc).__name__}: {exc}")
+        return f"{type(exc).__name__}: {exc}", None
+    return "", result
+
+
+def _run_task_captured(file_name: str, func: Callable[..., Any], args: tuple[Any, ...]) -> tuple[str, str, Any]:
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        error, result = _run_task(file_name, func, args)
+    return buffer.getvalue(), error, result
+
+
+def run_file_tasks(command: str, tasks: list[FileTask], jobs: int = 1) -> dict[str, Any]:
+    """Run per-file tasks serially or in a process pool; worker logs are printed in input order."""
+    started = time.perf_counter()
+    failures: dict[str, str] = {}
+    results: dict[str, Any] = {}
+    workers = min(jobs, len(tasks))
+    if workers <= 1:
+        for label, file_name, func, args in tasks:
+            print(f"[{label}] {file_name}")
+            error, results[file_name] = _run_task(file_name, func, args)
+            if error:
+                failures[file_name] = error
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_task_captured, file_name, func, args) for _, file_name, func, args in tasks]
+            for (label, file_name, _, _), future in zip(tasks, futures):
+                print(f"[{label}] {file_name}")
+                try:
+                    log, error, results[file_name] = future.result()
+                except Exception as exc:  # worker process died
+                    log, error = "", f"{type(exc).__name__}: {exc}"
+                    print(f"[error] {file_name}: {error}")
+                print(log, end="")
+                if error:
+                    failures[file_name] = error
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "command": command,
+        "files": len(tasks),
+        "failed": len(failures),
+        "failures": failures,
+        "results": results,
+        "seconds": elapsed,
+        "files_per_sec": len(tasks) / elapsed if elapsed > 0 else 0.0,
+        "jobs": max(workers, 1),
+    }
+    if tasks:
+        print(
+            f"[summary] {command}: {len(tasks) - len(failures)}/{len(tasks)} files ok "
+            f"in {elapsed:.1f}s ({summary['files_per_sec']:.2f} files/s, jobs={summary['jobs']})"
+        )
+        for file_name, error in failures.items():
+            print(f"  failed: {file_name}: {error}")
+    return summary
+
+
+def run_preprocess(
+    config: dict[str, Any],
+    stream: bool = False,
+    jobs: int | None = None,
+    cache_dir: str | Path | None = None,
+    profile: bool = False,
+    per_file_timings: bool = False,
+) -> dict[str, Any]:
+    """Preprocess ``preprocess.files``; per-stage timings go to ``quality_summary/stage_timings.*``
+    (``per_file_timings``: one ``<stem>_stage_timings.*`` per file).
+    """
+    paths = config["paths"]
+    cfg = config["preprocess"]
+    input_dir = project_path(paths["preprocess_input_dir"])
+    output_dir = project_path(paths["output_dir"]) / "preprocess"
+    summary_dir = output_dir / "quality_summary"
+    ensure_dir(output_dir)
+    ensure_dir(summary_dir)
+
+    if stream and cfg.get("output_format", "csv") != "csv":
+        print(f"[warn] --stream writes csv; output_format {cfg['output_format']!r} ignored")
+    if stream and cfg.get("precision", "float64") != "float64":
+        print("[warn] --stream computes in float64; precision ignored")
+    if stream and cfg.get("resample", {}).get("enabled", False):
+        print("[warn] --stream does not resample; resample ignored")
+    if stream and cfg.get("pipeline"):
+        print("[warn] --stream runs the fixed stage sequence; pipeline ignored")
+    sample_dtype(cfg)
+    if not stream:
+        nodes = build_pipeline(cfg)  # a config error stops here, not once per file
+        if cfg.get("pipeline"):
+            print(f"[pipeline] {len(nodes)} nodes:")
+            for line in describe_pipeline(nodes):
+                print(f"  {line}")
+    cache = None if stream else resolve_cache(config, cache_dir)
+    if stream and (cache_dir or cfg.get("cache", {}).get("dir")):
+        print("[warn] --stream does not use the stage cache")
+    profile_dir = output_dir / "profile" if profile else None
+    use_store = cfg.get("use_store", False) and not stream
+    store_dir = resolve_store_dir(config)
+    tasks: list[FileTask] = []
+    sources: dict[str, Path] = {}
+    for file_name in cfg["files"]:
+        input_path = sources[file_name] = input_dir / file_name
+        if use_store:
+            input_path = _current_store(store_path(store_dir, file_name), input_path)
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        if stream:
+            args = (input_path, output_dir, summary_dir, cfg, profile_dir)
+            tasks.append(("preprocess", file_name, preprocess_file_streaming, args))
+        else:
+            args = (input_path, output_dir, summary_dir, cfg, cache, profile_dir)
+            tasks.append(("preprocess", file_name, preprocess_file, args))
+    summary = run_file_tasks("preprocess", tasks, resolve_jobs(config, jobs))
+    update_catalog(config, "preprocess", summary, sources)
+    for timings_path in write_stage_timings(summary["results"], summary_dir, per_file_timings):
+        print(f"[timings] saved: {timings_path.with_suffix('.csv')} / .json")
+    if profile_dir is not None:
+        print(f"[profile] pstats saved in: {profile_dir}")
+    if cache is not None:
+        metas = [meta for meta in summary["results"].values() if meta]
+        hits = sum(meta["cache_hits"] for meta in metas)
+        misses = sum(meta["cache_misses"] for meta in metas)
+        size_mb = cache.size_bytes() / (1024 * 1024)
+        print(f"[cache] {hits} stage hits, {misses} misses; {cache.directory} holds {size_mb:.1f} MB")
+        summary["cache"] = {"hits": hits, "misses": misses, "size_mb": size_mb}
+    return summary
+
+
+def run_ingest(config: dict[str, Any], jobs: int | None = None) -> dict[str, Any]:
+    paths = config["paths"]
+    cfg = config["preprocess"]
+    store_dir = resolve_store_dir(config)
+    ensure_dir(store_dir)
+    chunk_rows = int(cfg.get("stream", {}).get("chunk_rows", 65536))
+
+    tasks: list[FileTask] = []
+    sources: dict[str, Path] = {}
+    for file_name in cfg["files"]:
+        input_path = project_path(paths["preprocess_input_dir"]) / file_name
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        sources[file_name] = input_path
+        tasks.append(("ingest", file_name, ingest_csv, (input_path, store_dir, cfg["raw_columns"], chunk_rows)))
+
+    for file_name in config["convert"].get("edf_files", []):
+        input_path = project_path(paths["convert_input_dir"]) / file_name
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        sources[file_name] = input_path
+        tasks.append(("ingest edf", file_name, ingest_edf, (input_path, store_dir, chunk_rows)))
+    summary = run_file_tasks("ingest", tasks, resolve_jobs(config, jobs))
+    update_catalog(config, "ingest", summary, sources)
+    return summary
+
+
+def run_direct_data(config: dict[str, Any], jobs: int | None = None) -> dict[str, Any]:
+    paths = config["paths"]
+    input_dir = project_path(paths["direct_input_dir"])
+    output_dir = project_path(paths["output_dir"]) / "direct_data"
+    ensure_dir(output_dir)
+
+    tasks: list[FileTask] = []
+    sources: dict[str, Path] = {}
+    for file_name in config["direct_data"]["files"]:
+        input_path = input_dir / file_name
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        output_format = config["direct_data"].get("output_format", "csv")
+        chunk_mb = config["direct_data"].get("chunk_mb", DIRECT_CHUNK_MB)
+        sources[file_name] = input_path
+        tasks.append(("direct", file_name, organize_direct_csv, (input_path, output_dir, output_format, chunk_mb)))
+    summary = run_file_tasks("direct", tasks, resolve_jobs(config, jobs))
+    update_catalog(config, "direct", summary, sources)
+    return summary
+
+
+def run_convert(config: dict[str, Any], jobs: int | None = None) -> dict[str, Any]:
+    paths = config["paths"]
+    input_dir = project_path(paths["convert_input_dir"])
+    output_dir = project_path(paths["output_dir"]) / "convert"
+    ensure_dir(output_dir)
+
+    tasks: list[FileTask] = []
+    sources: dict[str, Path] = {}
+    for file_name in config["convert"].get("edf_files", []):
+        input_path = input_dir / file_name
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        convert_cfg = config["convert"]
+        output_format = convert_cfg.get("output_format", "csv")
+        chunk_sec = float(convert_cfg.get("edf_chunk_sec", 300.0))
+        edf_reader = convert_cfg.get("edf_reader", "numpy")
+        sources[file_name] = input_path
+        tasks.append(("convert edf", file_name, edf_to_csv, (input_path, output_dir, output_format, chunk_sec, edf_reader)))
+
+    for file_name in config["convert"].get("csv_to_mat_files", []):
+        input_path = project_path(file_name)
+        if not input_path.exists():
+            print(f"[skip] missing file: {input_path}")
+            continue
+        mat_format = config["convert"].get("mat_format", "v5")
+        chunk_rows = int(config["convert"].get("mat_chunk_rows", 262144))
+        sources[file_name] = input_path
+        tasks.append(("convert mat", file_name, csv_to_mat, (input_path, output_dir, mat_format, chunk_rows)))
+    summary = run_file_tasks("convert", tasks, resolve_jobs(config, jobs))
+    update_catalog(config, "convert", summary, sources)
+    return summary
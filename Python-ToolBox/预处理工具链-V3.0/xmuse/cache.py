@@ -0,0 +1,114 @@
+"""On-disk cache of preprocess stage outputs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .config import _json_default, ensure_dir, project_path
+from .recording import Recording
+from .tables import file_digest
+
+
+# ---Stage cache---
+# 每个预处理阶段的结果按 (输入文件内容hash + 该阶段及之前各阶段的参数) 存到缓存目录，
+# 重跑时从最后一个命中的阶段继续；缓存总大小超过上限时按最近使用时间淘汰
+
+
+CACHE_VERSION = 4
+
+
+class StageCache:
+    """On-disk ``.npz`` store of stage outputs with size-bounded LRU eviction.
+
+    A stage key chains the previous key with the stage parameters; the source is keyed by
+    ``(size, mtime_ns, path)``, or by its sha256 with ``content_hash``.
+    """
+
+    def __init__(self, directory: str | Path, max_size_mb: float = 2048.0, content_hash: bool = False) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.content_hash = content_hash
+        ensure_dir(self.directory)
+
+    def source_key(self, path: str | Path) -> str:
+        """One ``stat`` call by default; a rewritten file gets a new mtime and so new keys."""
+        if self.content_hash:
+            return f"sha256:{file_digest(path)}"
+        stat = os.stat(path)
+        return f"stat:{stat.st_size}:{stat.st_mtime_ns}:{Path(path).resolve()}"
+
+    def stage_keys(self, source_key: str, stages: list[tuple[str, dict[str, Any]]]) -> list[str]:
+        return self.chain_keys(f"v{CACHE_VERSION}:{source_key}", stages)
+
+    @staticmethod
+    def chain_keys(key: str, stages: list[tuple[str, dict[str, Any]]]) -> list[str]:
+        """Keys of ``stages`` run after the stage whose key is ``key`` (a branch of the pipeline)."""
+        keys = []
+        for name, params in stages:
+            payload = json.dumps([key, name, params], sort_keys=True, default=str)
+            key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            keys.append(key)
+        return keys
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+    def get(self, key: str) -> tuple[Recording, dict[str, Any]] | None:
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                header = json.loads(str(entry["header"]))
+                rec = Recording(entry["data"], entry["time"], header["fs"], header["channels"], header["log"], entry["segments"])
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:  # truncated or stale entry: drop it and recompute
+            print(f"[warn] cache entry {path.name} unreadable ({exc}); recomputing")
+            path.unlink(missing_ok=True)
+            return None
+        return rec, header["meta"]
+
+    def put(self, key: str, rec: Recording, meta: dict[str, Any]) -> None:
+        path = self._path(key)
+        header = json.dumps({"fs": rec.fs, "channels": rec.channels, "log": rec.log, "meta": meta}, default=_json_default)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, data=rec.data, time=rec.time, segments=rec.segments, header=np.array(header))
+        os.replace(tmp_name, path)  # atomic, so concurrent workers never read half an entry
+        self.evict()
+
+    def size_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self.directory.glob("*.npz"))
+
+    def evict(self) -> None:
+        entries = []
+        for entry in self.directory.glob("*.npz"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # removed by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+
+def resolve_cache(config: dict[str, Any], cache_dir: str | Path | None = None) -> StageCache | None:
+    """CLI ``--cache-dir`` wins over ``preprocess.cache.dir``; an empty dir disables the cache."""
+    cache_cfg = config["preprocess"].get("cache", {})
+    directory = cache_dir or cache_cfg.get("dir") or ""
+    if not directory:
+        return None
+    return StageCache(
+        project_path(directory), float(cache_cfg.get("max_size_mb", 2048.0)), bool(cache_cfg.get("content_hash", False))
+    )
@@ -0,0 +1,263 @@
+"""SQLite catalog of processed files."""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .config import ensure_dir, load_config, project_path
+from .recording import gap_index, gap_stats
+from .store import RecordingStore, is_store
+from .tables import file_digest
+
+
+# ---Catalog---
+# SQLite目录库：每个命令处理完一批文件后，把源文件的路径、哈希、采样率、时长、通道、断点和逐通道统计写进去，
+# 文件大小和修改时间不变时沿用已有的哈希；按时长、某通道伪迹比例等筛选文件只查库，不再打开原始数据
+
+CATALOG_FILE_COLUMNS = {
+    "name": "TEXT",
+    "command": "TEXT",
+    "size": "INTEGER",
+    "mtime_ns": "INTEGER",
+    "sha256": "TEXT",
+    "fs": "REAL",
+    "duration_sec": "REAL",
+    "n_samples": "INTEGER",
+    "channels": "TEXT",
+    "segments": "INTEGER",
+    "gap_count": "INTEGER",
+    "gap_sec": "REAL",
+    "max_gap_sec": "REAL",
+    "outliers": "INTEGER",
+    "updated": "TEXT",
+}
+CATALOG_CHANNEL_COLUMNS = {
+    "missing": "INTEGER",
+    "mean": "REAL",
+    "std": "REAL",
+    "min": "REAL",
+    "max": "REAL",
+    "outliers": "INTEGER",
+    "outlier_frac": "REAL",
+}
+_CATALOG_CONDITION = re.compile(r"^\s*(?:(?:([\w-]+)\.)?([\w-]+)\.)?(\w+)\s*(<=|>=|!=|==|=|<|>)\s*(.+?)\s*$")
+
+
+def _duration(times: np.ndarray) -> float:
+    valid = times[~np.isnan(times)]
+    return float(valid[-1] - valid[0]) if len(valid) else 0.0
+
+
+def _blank_to_none(value: Any) -> Any:
+    return None if value == "" else value
+
+
+def catalog_entry(
+    rows: list[dict[str, Any]],
+    fs: float,
+    duration_sec: float,
+    gaps: dict[str, Any] | None = None,
+    outlier_counts: dict[str, int] | None = None,
+) -> dict[str, Any]:
+    """Catalog facts of one written recording from its quality-summary rows (see ``_quality_row``)."""
+    counts = outlier_counts or {}
+    stats = []
+    for row in rows:
+        if not row["exists"]:
+            continue
+        count = counts.get(row["channel"])
+        stats.append(
+            {
+                "stage": row["stage"],
+                "channel": row["channel"],
+                "missing": _blank_to_none(row["missing_count"]),
+                **{key: _blank_to_none(row[key]) for key in ("mean", "std", "min", "max")},
+                "outliers": count,
+                "outlier_frac": count / row["samples"] if count is not None and row["samples"] else None,
+            }
+        )
+    entry = {
+        "fs": fs,
+        "duration_sec": duration_sec if np.isfinite(duration_sec) else None,
+        "n_samples": rows[0]["samples"] if rows else 0,
+        "channels": [row["channel"] for row in rows if row["exists"]],
+        "stats": stats,
+    }
+    if gaps is not None:
+        entry.update({key: gaps[key] for key in ("segments", "gap_count", "gap_sec", "max_gap_sec")})
+    if counts:
+        entry["outliers"] = int(sum(counts.values()))
+    return entry
+
+
+def store_entry(store: RecordingStore) -> dict[str, Any]:
+    """Catalog facts of an ingested store, read from its meta and time axis only."""
+    times = np.asarray(store.time)
+    return {
+        "sha256": store.meta["source_sha256"],
+        "fs": store.fs,
+        "duration_sec": _duration(times),
+        "n_samples": len(store),
+        "channels": store.channels,
+        **gap_stats(times, gap_index(times)),
+    }
+
+
+class Catalog:
+    """SQLite catalog: a ``files`` row per source path and a ``channel_stats`` row per path, stage and channel."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        ensure_dir(path.parent)
+        self.db = sqlite3.connect(path, timeout=30.0)
+        file_columns = ", ".join(f"{name} {kind}" for name, kind in CATALOG_FILE_COLUMNS.items())
+        channel_columns = ", ".join(f"{name} {kind}" for name, kind in CATALOG_CHANNEL_COLUMNS.items())
+        with self.db:
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, {file_columns})")
+            self.db.execute(
+                f"CREATE TABLE IF NOT EXISTS channel_stats (path TEXT, stage TEXT, channel TEXT, {channel_columns}, "
+                "PRIMARY KEY (path, stage, channel))"
+            )
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def record(self, command: str, source: Path, entry: dict[str, Any] | None = None) -> None:
+        entry = dict(entry or {})
+        source = source.resolve()
+        stat = source.stat()
+        known = self.db.execute("SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (str(source),)).fetchone()
+        current = known is not None and tuple(known[:2]) == (stat.st_size, stat.st_mtime_ns)
+        if "sha256" not in entry:
+            entry["sha256"] = known[2] if current and known[2] else file_digest(source)
+        if isinstance(entry.get("channels"), list):
+            entry["channels"] = ",".join(entry["channels"])
+        values = {key: entry[key] for key in CATALOG_FILE_COLUMNS if key in entry}
+        values.update(
+            name=source.name,
+            command=command,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            updated=time.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        names = ", ".join(values)
+        marks = ", ".join("?" for _ in values)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in values)
+        with self.db:
+            if not current:
+                self.db.execute("DELETE FROM files WHERE path = ?", (str(source),))
+                self.db.execute("DELETE FROM channel_stats WHERE path = ?", (str(source),))
+            self.db.execute(
+                f"INSERT INTO files (path, {names}) VALUES (?, {marks}) ON CONFLICT(path) DO UPDATE SET {updates}",
+                (str(source), *values.values()),
+            )
+            for stats in entry.get("stats", []):
+                self.db.execute(
+                    f"INSERT OR REPLACE INTO channel_stats (path, {', '.join(stats)}) VALUES (?, {', '.join('?' for _ in stats)})",
+                    (str(source), *stats.values()),
+                )
+
+    def select(self, conditions: list[str] | tuple[str, ...] = ()) -> list[dict[str, Any]]:
+        """``files`` rows matching all conditions (e.g. ``AF7.outlier_frac<0.01``), ordered by path."""
+        clauses, params = [], []
+        for text in conditions:
+            match = _CATALOG_CONDITION.match(text)
+            if match is None:
+                raise ValueError(f"cannot parse catalog condition {text!r}; expected e.g. 'duration_sec>1200' or 'AF7.outlier_frac<0.01'")
+            stage, channel, column, op, raw = match.groups()
+            op = "=" if op == "==" else op
+            try:
+                value: Any = float(raw)
+            except ValueError:
+                value = raw.strip("'\"")
+            if channel is None:
+                if column not in CATALOG_FILE_COLUMNS:
+                    raise ValueError(f"unknown catalog column {column!r}, choose from {list(CATALOG_FILE_COLUMNS)}")
+                clauses.append(f"f.{column} {op} ?")
+                params.append(value)
+                continue
+            if column not in CATALOG_CHANNEL_COLUMNS:
+                raise ValueError(f"unknown channel column {column!r}, choose from {list(CATALOG_CHANNEL_COLUMNS)}")
+            clause = f"SELECT 1 FROM channel_stats c WHERE c.path = f.path AND c.channel = ? AND c.{column} {op} ?"
+            params += [channel, value]
+            if stage is not None:
+                clause += " AND c.stage = ?"
+                params.append(stage)
+            clauses.append(f"EXISTS ({clause})")
+        sql = "SELECT * FROM files f" + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY f.path"
+        cursor = self.db.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+
+def resolve_catalog_path(config: dict[str, Any]) -> Path | None:
+    """``catalog.path``, relative to ``paths.output_dir``; an empty value turns the catalog off."""
+    path = config.get("catalog", {}).get("path", "catalog.sqlite")
+    if not path:
+        return None
+    return Path(path) if Path(path).is_absolute() else project_path(config["paths"]["output_dir"]) / path
+
+
+def update_catalog(config: dict[str, Any], command: str, summary: dict[str, Any], sources: dict[str, Path]) -> None:
+    """Record the files of a ``run_file_tasks`` batch that succeeded; a catalog error only warns."""
+    path = resolve_catalog_path(config)
+    done = [name for name in sources if name in summary["results"] and name not in summary["failures"]]
+    if path is None or not done:
+        return
+    try:
+        with Catalog(path) as catalog:
+            for name in done:
+                result = summary["results"][name]
+                if isinstance(result, Path) and is_store(result):
+                    entry = store_entry(RecordingStore.open(result))
+                elif isinstance(result, dict):
+                    entry = result.get("catalog", result)
+                else:
+                    entry = None
+                catalog.record(command, sources[name], entry)
+    except (sqlite3.Error, OSError) as exc:
+        print(f"[warn] catalog not updated: {type(exc).__name__}: {exc}")
+        return
+    print(f"[catalog] {len(done)} files recorded in {path}")
+
+
+def catalog_files(
+    conditions: list[str] | tuple[str, ...], config: dict[str, Any] | None = None, directory: str | Path | None = None
+) -> list[str]:
+    """Names of the catalogued files matching ``conditions`` (see ``Catalog.select``), optionally
+    only those in ``directory``; the feature scripts turn them into their input names."""
+    config = config if config is not None else load_config()
+    path = resolve_catalog_path(config)
+    if path is None or not path.exists():
+        raise FileNotFoundError(f"no catalog at {path}; run a toolkit command first or set catalog.path")
+    folder = project_path(directory).resolve() if directory is not None else None
+    with Catalog(path) as catalog:
+        rows = catalog.select(conditions)
+    return [row["name"] for row in rows if folder is None or Path(row["path"]).parent == folder]
+
+
+def run_catalog(config: dict[str, Any], conditions: list[str]) -> list[dict[str, Any]]:
+    path = resolve_catalog_path(config)
+    if path is None or not path.exists():
+        print(f"[catalog] no catalog at {path}")
+        return []
+    with Catalog(path) as catalog:
+        rows = catalog.select(conditions)
+    for row in rows:
+        duration = f"{row['duration_sec']:.1f}s" if row["duration_sec"] is not None else "-"
+        fs = f"{row['fs']:.2f} Hz" if row["fs"] is not None else "-"
+        print(f"{row['path']}\t{row['command']}\t{duration}\t{fs}\t{row['channels'] or ''}")
+    print(f"[catalog] {len(rows)} files match")
+    return rows
@@ -0,0 +1,36 @@
+"""Config loading and project-relative paths."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CONFIG = ROOT / "config.json"
+
+
+def load_config(config_path: str | Path = DEFAULT_CONFIG) -> dict[str, Any]:
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ensure_dir(path: Path) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def project_path(path_value: str | Path) -> Path:
+    path = Path(path_value)
+    return path if path.is_absolute() else ROOT / path
+
+
+def _json_default(value: Any) -> Any:
+    """numpy scalars/arrays and paths in job results."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,195 @@
+"""PSD, DE, wPLI and TFR feature tables."""
+
+from __future__ import annotations
+
+import functools
+import warnings
+from itertools import combinations
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .recording import Epochs, Recording, _segment_epochs
+from .stages import _butter_sos
+
+
+# ---Features---
+# 06_02/06_03/06_04/06_05脚本里的PSD、wPLI、TFR、DE计算，作为流水线的特征节点；算法和输出表格式与脚本相同，
+# 分段数据按(epochs, samples, channels)整块滤波，每次最多block个epoch，不逐个epoch建DataFrame
+
+PSD_BANDS = {"Delta": [0.5, 4.0], "Theta": [4.0, 8.0], "Alpha": [8.0, 12.0], "Beta1": [12.0, 15.0], "Beta2": [15.0, 20.0]}
+DE_BANDS = {"delta": [1.0, 4.0], "theta": [4.0, 8.0], "alpha": [8.0, 13.0], "beta": [13.0, 30.0], "gamma": [30.0, 45.0]}
+
+
+@functools.lru_cache(maxsize=64)
+def _band_ba(fs: float, low: float, high: float, order: int = 5) -> tuple[np.ndarray, np.ndarray]:
+    """The feature scripts' Butterworth band-pass as ``(b, a)``, cached by ``(fs, low, high, order)``."""
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs
+    return butter(order, [low / nyq, high / nyq], btype="band")
+
+
+def psd_features(rec: Recording, channels: list[str], window_sec: float = 2.0, bands: dict[str, Any] = PSD_BANDS) -> pd.DataFrame | None:
+    """Mean Welch PSD over ``channels`` with each band's relative power (``*_psd.csv`` of 06_02)."""
+    from scipy.signal import welch
+
+    nperseg = int(window_sec * rec.fs)
+    freqs, powers = None, []
+    for col in rec.indices(channels):
+        seg_powers, weights = [], []
+        for start, stop in rec.segments:
+            data = rec.data[start:stop, col]
+            data = data[~np.isnan(data)]
+            if len(data) >= nperseg:
+                freqs, power = welch(data, rec.fs, nperseg=nperseg)
+                seg_powers.append(power)
+                weights.append(len(data))
+        if seg_powers:
+            powers.append(np.average(seg_powers, axis=0, weights=weights))
+    if not powers:
+        return None
+    psd = np.mean(powers, axis=0)
+    total = psd.sum()
+    table = pd.DataFrame({"frequency": freqs, "power": psd})
+    for name, (low, high) in bands.items():
+        mask = (freqs >= low) & (freqs <= high)
+        table[f"{name}_rel_power"] = psd[mask].sum() / total if total > 0 else 0
+    return table
+
+
+def _de_from_var(var: np.ndarray) -> np.ndarray:
+    """``0.5 * ln(2*pi*e*var)``, 0 where the variance is not positive (NaN stays NaN)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        de = 0.5 * np.log(2 * np.pi * np.exp(1) * var)
+    return np.where(var > 0, de, np.where(np.isnan(var), np.nan, 0.0))
+
+
+def de_matrix(
+    values: np.ndarray,
+    fs: float,
+    bands: dict[str, Any] = DE_BANDS,
+    order: int = 5,
+    block: int = 512,
+    sos: bool = True,
+    cols: list[int] | None = None,
+) -> np.ndarray:
+    """Batched DE: ``(n_epochs, n_samples, n_channels)`` -> ``(n_epochs, n_channels * n_bands)``, as ``*_DE.csv``.
+
+    ``sos=False`` uses the old script's ``(b, a)`` band-pass, only to reproduce its tables.
+    """
+    from scipy.signal import filtfilt, sosfiltfilt
+
+    def band_filter(data: np.ndarray, low: float, high: float) -> np.ndarray:
+        if sos:
+            return sosfiltfilt(_butter_sos(float(fs), (float(low), float(high)), "band", order), data, axis=-1)
+        b, a = _band_ba(float(fs), float(low), float(high), order)
+        return filtfilt(b, a, data, axis=-1)
+
+    n_epochs, n_samples = values.shape[:2]
+    n_channels = len(cols) if cols is not None else values.shape[2]
+    out = np.zeros((n_epochs, n_channels, len(bands)))
+    for start in range(0, n_epochs, block):
+        chunk = values[start : start + block]
+        chunk = np.asarray(chunk if cols is None else chunk[:, :, cols], dtype=np.float64).transpose(0, 2, 1)
+        target = out[start : start + block]
+        has_nan = np.isnan(chunk).any(axis=2)
+        rows = chunk[~has_nan]  # (epoch x channel, samples), contiguous along time
+        if len(rows) and n_samples > 3 * order:
+            for k, (low, high) in enumerate(bands.values()):
+                target[~has_nan, k] = _de_from_var(band_filter(rows, low, high).var(axis=-1, ddof=1))
+        for epoch, channel in zip(*np.nonzero(has_nan)):
+            signal = chunk[epoch, channel]
+            signal = signal[~np.isnan(signal)]
+            if len(signal) == 0:
+                target[epoch, channel] = np.nan
+            elif len(signal) > 3 * order:
+                for k, (low, high) in enumerate(bands.values()):
+                    target[epoch, channel, k] = _de_from_var(band_filter(signal, low, high).var(ddof=1))
+    return out.reshape(n_epochs, n_channels * len(bands))
+
+
+def de_features(
+    epochs: Epochs, channels: list[str], bands: dict[str, Any] = DE_BANDS, order: int = 5, block: int = 512, sos: bool = True
+) -> pd.DataFrame:
+    """Differential entropy per epoch, channel and band as the ``*_DE.csv`` table of 06_05 (see ``de_matrix``)."""
+    names = [channel for channel in channels if channel in epochs.columns]
+    idx = [epochs.columns.index(channel) for channel in names]
+    matrix = de_matrix(epochs.values, float(epochs.fs), bands, order, block, sos, idx)
+    table = pd.DataFrame(matrix, columns=[f"{chan}_{band}" for chan in names for band in bands])
+    table.insert(0, "epoch_id", np.arange(len(epochs)))
+    return table
+
+
+def _wpli_block(values: np.ndarray, fs: float, band: list[float], order: int) -> np.ndarray:
+    """wPLI of every channel pair in each window of a ``(n, samples, channels)`` block -> ``(n, pairs)``."""
+    from scipy.signal import filtfilt, hilbert
+
+    b, a = _band_ba(float(fs), float(band[0]), float(band[1]), order)
+    phase = np.angle(hilbert(filtfilt(b, a, values, axis=1), axis=1))
+    pairs = list(combinations(range(values.shape[2]), 2))
+    out = np.empty((len(values), len(pairs)))
+    for k, (i, j) in enumerate(pairs):
+        sin_diff = np.sin(phase[:, :, i] - phase[:, :, j])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, k] = np.abs(sin_diff.mean(axis=1)) / np.abs(sin_diff).mean(axis=1)
+    return out
+
+
+def wpli_features(
+    source: Recording | Epochs,
+    channels: list[str],
+    band: list[float],
+    order: int = 5,
+    window_sec: float = 2.0,
+    step_sec: float = 0.1,
+    block: int = 512,
+) -> pd.DataFrame:
+    """wPLI of each channel pair and their mean ``avg_wpli`` per epoch or per sliding window (06_03)."""
+    if isinstance(source, Epochs):
+        idx = [source.columns.index(channel) for channel in channels if channel in source.columns]
+        windows, fs = source.values, source.fs
+        label, position = "epoch_id", np.arange(len(source))
+    else:
+        idx, fs = source.indices(channels), source.fs
+        win, step = int(window_sec * fs), int(step_sec * fs)
+        windows = _segment_epochs(source.data, source.segments, win, step)
+        label, position = "time", _segment_epochs(source.time[:, None], source.segments, win, step)[:, win // 2, 0]
+    names = [(source.columns if isinstance(source, Epochs) else source.channels)[i] for i in idx]
+    out = np.empty((len(windows), len(names) * (len(names) - 1) // 2))
+    for start in range(0, len(windows), block):
+        chunk = np.asarray(windows[start : start + block][:, :, idx], dtype=np.float64)
+        out[start : start + block] = _wpli_block(chunk, fs, band, order)
+    table = pd.DataFrame(out, columns=[f"{ch1}-{ch2}" for ch1, ch2 in combinations(names, 2)])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # windows where every pair is NaN
+        table.insert(0, "avg_wpli", np.nanmean(out, axis=1) if out.shape[1] else np.nan)
+    table.insert(0, label, position)
+    return table
+
+
+def tfr_features(rec: Recording, channels: list[str], fmin: float = 1.0, fmax: float = 40.0, fstep: float = 1.0) -> pd.DataFrame | None:
+    """Morlet power averaged over ``channels``, one row per frequency (``*_tfr_*.csv`` of 06_04). Needs mne."""
+    try:
+        import mne
+    except ImportError as exc:
+        raise ImportError("TFR needs mne. Install it with: pip install mne") from exc
+
+    freqs = np.arange(fmin, fmax + fstep / 2, fstep)
+    cols = rec.indices(channels)
+    powers, times = [], []
+    for start, stop in rec.segments:
+        data = np.asarray(rec.data[start:stop, cols].T[np.newaxis], dtype=np.float64)
+        try:
+            power = mne.time_frequency.tfr_array_morlet(data, sfreq=rec.fs, freqs=freqs, n_cycles=freqs / 2.0, output="power")
+        except ValueError as exc:
+            print(f"  tfr: skipped a {stop - start}-sample segment: {exc}")
+            continue
+        powers.append(power[0].mean(axis=0))
+        times.append(rec.time[start:stop])
+    if not powers:
+        return None
+    table = pd.DataFrame(np.concatenate(powers, axis=-1), columns=[str(t) for t in np.concatenate(times)])
+    table.insert(0, "frequency", freqs)
+    return table
@@ -0,0 +1,423 @@
+"""Preprocess stage chains and the configurable pipeline."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+
+from .cache import StageCache
+from .catalog import _duration, catalog_entry
+from .features import DE_BANDS, PSD_BANDS, de_features, psd_features, tfr_features, wpli_features
+from .recording import GAP_FACTOR, Epochs, Recording, gap_stats
+from .reports import StageTimer, write_quality_summary
+from .stages import apply_baseline, apply_filters, clean_eeg_frame, interpolate_outliers, resample_uniform, scale_channels
+from .store import RecordingStore, is_store
+from .tables import read_raw_csv, read_table, sample_dtype, write_table
+
+
+def stage_defaults(stage: str, cfg: dict[str, Any]) -> dict[str, Any]:
+    """Parameters of one stage taken from the flat ``preprocess`` keys (see ``build_pipeline``)."""
+    gap_factor = float(cfg.get("gap_factor", GAP_FACTOR))
+    epoch_cfg = cfg.get("epoch", {})
+    defaults: dict[str, dict[str, Any]] = {
+        "clean": {"raw_columns": cfg["raw_columns"], "precision": cfg.get("precision", "float64"), "gap_factor": gap_factor},
+        "resample": {"target_hz": cfg.get("resample", {}).get("target_hz"), "gap_factor": gap_factor},
+        "baseline": {"channels": cfg["channels"], "baseline_window_sec": cfg["baseline_window_sec"]},
+        "filter": {
+            "highpass_hz": cfg["highpass_hz"],
+            "lowpass_hz": cfg["lowpass_hz"],
+            "notch_hz": cfg.get("notch_hz", [49.0, 51.0]),
+            "filter_mode": cfg.get("filter_mode", "sequential"),
+            "filter_design": cfg.get("filter_design", "ba"),
+        },
+        "outliers": {"amplitude_threshold": float(cfg["amplitude_threshold"])},
+        "scale": {"scale_method": cfg.get("scale_method", "zscore")},
+        "epoch": {"window_sec": float(epoch_cfg.get("window_sec", 1.0)), "overlap_rate": float(epoch_cfg.get("overlap_rate", 0.5))},
+        "psd": {"channels": cfg["channels"], "window_sec": 2.0, "bands": PSD_BANDS},
+        "de": {"channels": cfg["channels"], "bands": DE_BANDS, "order": 5, "sos": True},
+        "wpli": {"channels": cfg["channels"], "band": [8.0, 12.0], "order": 5, "window_sec": 2.0, "step_sec": 0.1},
+        "tfr": {"channels": cfg["channels"][:1], "fmin": 1.0, "fmax": 40.0, "fstep": 1.0},
+        "write": {"suffix": None, "output_format": cfg.get("output_format", "csv")},
+    }
+    return dict(defaults[stage])
+
+
+def preprocess_stage_params(cfg: dict[str, Any]) -> list[tuple[str, dict[str, Any]]]:
+    """The preprocess stages in order, each with the config values that change its output."""
+    names = ["clean", "resample", "baseline", "filter", "outliers", "scale"]
+    if not cfg.get("resample", {}).get("enabled", False):
+        names.remove("resample")
+    return [(name, stage_defaults(name, cfg)) for name in names]
+
+
+def _apply_stage(rec: Recording, name: str, params: dict[str, Any], cfg: dict[str, Any], meta: dict[str, Any]) -> None:
+    """Run one array stage other than clean in place on ``rec``."""
+    channels = params.get("channels", cfg["channels"])
+    if name == "resample":
+        resample_uniform(rec, channels, params["target_hz"], params["gap_factor"], inplace=True)
+    elif name == "baseline":
+        apply_baseline(rec, channels, params["baseline_window_sec"], rec.fs, inplace=True)
+    elif name == "filter":
+        apply_filters(rec, channels, params, rec.fs, inplace=True, workers=int(cfg.get("segment_workers", 1)))
+    elif name == "outliers":
+        _, counts, _ = interpolate_outliers(rec, channels, float(params["amplitude_threshold"]), inplace=True)
+        meta["fixed_count"] = sum(counts.values())
+        meta["outlier_counts"] = counts
+    elif name == "scale":
+        scale_channels(rec, channels, params["scale_method"], inplace=True)
+    else:
+        raise ValueError(f"{name!r} is not an array stage")
+    if name == "resample" and rec.log[-1]["stage"] == "resample":
+        entry = rec.log[-1]
+        print(f"  resampled: {entry['estimated_hz']:.2f} Hz ({entry['gaps']} gaps) -> {rec.fs:g} Hz")
+
+
+def _resume_from_cache(
+    cache: StageCache | None, keys: list[str], timer: StageTimer
+) -> tuple[int, Recording | None, dict[str, Any]]:
+    """``(index after the last cached stage, its recording, its meta)``; ``(0, None, {})`` on a miss."""
+    if cache is None:
+        return 0, None, {}
+    with timer.stage("cache_read") as row:
+        for index in range(len(keys) - 1, -1, -1):
+            entry = cache.get(keys[index])
+            if entry is not None:
+                row["samples"] = len(entry[0])
+                return index + 1, entry[0], entry[1]
+    return 0, None, {}
+
+
+def run_stage_chain(
+    rec: Recording,
+    stages: list[tuple[str, dict[str, Any]]],
+    cfg: dict[str, Any],
+    cache: StageCache | None = None,
+    timer: StageTimer | None = None,
+    parent_key: str | None = None,
+    labels: list[str] | None = None,
+    meta: dict[str, Any] | None = None,
+) -> tuple[Recording, dict[str, Any]]:
+    """Run array ``stages`` (no clean) on a copy of ``rec``, resuming from the cache below ``parent_key``."""
+    timer = timer if timer is not None else StageTimer("")
+    keys = StageCache.chain_keys(parent_key, stages) if cache is not None and parent_key else []
+    start, cached, cached_meta = _resume_from_cache(cache if keys else None, keys, timer)
+    meta = dict(cached_meta or meta or {"fs": rec.fs, "fixed_count": 0})
+    rec = cached if cached is not None else rec.copy()
+    for index in range(start, len(stages)):
+        name, params = stages[index]
+        with timer.stage(labels[index] if labels else name, len(rec)):
+            _apply_stage(rec, name, params, cfg, meta)
+        meta["fs"] = rec.fs
+        if keys:
+            with timer.stage("cache_write", len(rec)):
+                cache.put(keys[index], rec, meta)
+    meta = {**meta, "cache_hits": start, "cache_misses": len(stages) - start}
+    if keys:
+        meta["cache_key"] = keys[-1]
+    return rec, meta
+
+
+def run_preprocess_stages(
+    input_path: Path,
+    cfg: dict[str, Any],
+    cache: StageCache | None = None,
+    timer: StageTimer | None = None,
+    stages: list[tuple[str, dict[str, Any]]] | None = None,
+    labels: list[str] | None = None,
+) -> tuple[Recording, dict[str, Any]]:
+    """Run clean (-> resample) -> baseline -> filter -> outliers -> scale, resuming from the cache.
+
+    ``input_path`` is a raw CSV/table or an ingested ``.xstore``; returns the recording and its meta.
+    """
+    timer = timer if timer is not None else StageTimer(input_path.name)
+    stages = stages if stages is not None else preprocess_stage_params(cfg)
+    clean = stages[0][1]
+    dtype = sample_dtype(clean)
+    store = RecordingStore.open(input_path) if is_store(input_path) else None
+    keys: list[str] = []
+    if cache is not None:
+        source_key = f"store:{store.meta['source_sha256']}" if store is not None else cache.source_key(input_path)
+        keys = cache.stage_keys(source_key, stages)
+
+    start, rec, meta = _resume_from_cache(cache, keys, timer)
+    if rec is None:
+        meta = {"fs": 0.0, "fixed_count": 0}
+
+    for index in range(start, len(stages)):
+        name, params = stages[index]
+        label = labels[index] if labels else name
+        if name == "clean":
+            with timer.stage("read") as row:
+                if store is not None:
+                    rec = Recording.from_store(store, dtype, params["gap_factor"])
+                elif input_path.suffix.lower() == ".csv":
+                    raw = read_raw_csv(input_path, params["raw_columns"], cfg.get("csv_engine", "auto"), dtype)
+                else:
+                    raw = read_table(input_path)
+                row["samples"] = len(rec) if store is not None else len(raw)
+            if store is None:
+                with timer.stage(label, len(raw)):
+                    rec = Recording.from_raw(raw, params["raw_columns"], dtype)
+                    clean_eeg_frame(rec, params["raw_columns"], inplace=True, gap_factor=params["gap_factor"])
+                    del raw
+        else:
+            with timer.stage(label, len(rec)):
+                _apply_stage(rec, name, params, cfg, meta)
+        meta["fs"] = rec.fs
+        if cache is not None:
+            with timer.stage("cache_write", len(rec)):
+                cache.put(keys[index], rec, meta)
+
+    meta = {**meta, "cache_hits": start if cache is not None else 0, "cache_misses": len(stages) - start}
+    if cache is not None:
+        resumed = f"resumed after {stages[start - 1][0]}" if start else "no cached stage"
+        print(f"  cache: {resumed} ({meta['cache_hits']} hit, {meta['cache_misses']} miss)")
+        meta["cache_key"] = keys[-1]
+    return rec, meta
+
+
+# ---Pipeline---
+# preprocess.pipeline按顺序列出节点：{"stage": 类型, "id": 名字(默认同stage), "input": 上游节点id, 其余键为参数}，
+# 没写的参数取preprocess里的同名配置；input默认取前面最近的、输出类型能接上的节点。pipeline留空时按原来的固定顺序
+# clean -> (resample) -> baseline -> filter -> outliers -> scale -> write (-> epoch -> write) 生成。
+# 只有一个下游的相邻数组阶段合并成一条链，在同一块内存上原地执行，中间结果不落盘；分叉处复制一次。
+# 每个记录只读一次原始文件，所有输出(write节点和特征表)在最后统一写一次
+
+ARRAY_STAGES = ("clean", "resample", "baseline", "filter", "outliers", "scale")
+FEATURE_STAGES = ("psd", "de", "wpli", "tfr")
+# what each stage gives and what it can take (recording / epochs / table)
+_STAGE_OUTPUT = {**{stage: "recording" for stage in ARRAY_STAGES}, "epoch": "epochs", **{stage: "table" for stage in FEATURE_STAGES}, "write": None}
+_STAGE_INPUTS = {
+    **{stage: ("recording",) for stage in ARRAY_STAGES[1:]},
+    "epoch": ("recording",),
+    "psd": ("recording",),
+    "tfr": ("recording",),
+    "de": ("epochs",),
+    "wpli": ("recording", "epochs"),
+    "write": ("recording", "epochs"),
+}
+_WRITE_SUFFIX = {"recording": "preprocessed", "epochs": "preprocessed_epoched"}
+
+
+class PipelineNode:
+    """One node of ``preprocess.pipeline`` with its resolved input, parameters and consumers."""
+
+    __slots__ = ("id", "stage", "input", "params", "consumers")
+
+    def __init__(self, node_id: str, stage: str, input_id: str | None, params: dict[str, Any]) -> None:
+        self.id = node_id
+        self.stage = stage
+        self.input = input_id
+        self.params = params
+        self.consumers: list[str] = []
+
+    @property
+    def output(self) -> str | None:
+        return _STAGE_OUTPUT[self.stage]
+
+
+def default_pipeline(cfg: dict[str, Any]) -> list[dict[str, Any]]:
+    """The fixed preprocess sequence as pipeline nodes."""
+    nodes: list[dict[str, Any]] = [{"stage": name} for name, _ in preprocess_stage_params(cfg)]
+    nodes.append({"stage": "write"})
+    if cfg.get("epoch", {}).get("enabled", False):
+        nodes += [{"stage": "epoch"}, {"stage": "write", "id": "write_epochs"}]
+    return nodes
+
+
+def build_pipeline(cfg: dict[str, Any]) -> list[PipelineNode]:
+    """Validate ``preprocess.pipeline`` (or the default sequence) into nodes in execution order."""
+    nodes: list[PipelineNode] = []
+    by_id: dict[str, PipelineNode] = {}
+    outputs: set[str] = set()
+    for position, spec in enumerate(cfg.get("pipeline") or default_pipeline(cfg)):
+        spec = dict(spec)
+        stage = spec.pop("stage", None)
+        if stage not in _STAGE_OUTPUT:
+            raise ValueError(f"pipeline[{position}]: unknown stage {stage!r}, choose from {list(_STAGE_OUTPUT)}")
+        node_id = str(spec.pop("id", stage))
+        if node_id in by_id:
+            raise ValueError(f"pipeline[{position}]: duplicate id {node_id!r}; give the node its own \"id\"")
+        if (stage == "clean") != (position == 0):
+            raise ValueError("pipeline: the first node, and only the first, must be clean (the single read)")
+        input_id = spec.pop("input", None)
+        if stage != "clean":
+            accepted = _STAGE_INPUTS[stage]
+            if input_id is None:
+                input_id = next((node.id for node in reversed(nodes) if node.output in accepted), None)
+            source = by_id.get(input_id)
+            if source is None:
+                raise ValueError(f"pipeline[{position}] {node_id}: input {input_id!r} is not an earlier node")
+            if source.output not in accepted:
+                raise ValueError(f"pipeline[{position}] {node_id}: {stage} cannot take the {source.output} of {input_id!r}")
+        params = stage_defaults(stage, cfg)
+        unknown = set(spec) - set(params) - {"channels"}
+        if unknown:
+            raise ValueError(f"pipeline[{position}] {node_id}: unknown parameters {sorted(unknown)} for {stage}")
+        params.update(spec)
+        node = PipelineNode(node_id, stage, input_id, params)
+        if stage == "write":
+            params["suffix"] = params["suffix"] or _WRITE_SUFFIX[by_id[input_id].output]
+        if stage in FEATURE_STAGES or stage == "write":
+            name = params["suffix"] if stage == "write" else node_id
+            if name in outputs:
+                raise ValueError(f"pipeline[{position}] {node_id}: output name {name!r} is used twice")
+            outputs.add(name)
+        if input_id is not None:
+            by_id[input_id].consumers.append(node_id)
+        nodes.append(node)
+        by_id[node_id] = node
+    return nodes
+
+
+def pipeline_chains(nodes: list[PipelineNode]) -> list[list[PipelineNode]]:
+    """Group the array nodes into chains that overwrite their input in place; a branch starts on a copy."""
+    by_id = {node.id: node for node in nodes}
+    chains: list[list[PipelineNode]] = []
+    chain_of: dict[str, list[PipelineNode]] = {}
+    for node in nodes:
+        if node.output != "recording":
+            continue
+        source = by_id.get(node.input) if node.input else None
+        if source is not None and source.output == "recording" and source.consumers == [node.id]:
+            chain = chain_of[source.id]
+            chain.append(node)
+        else:
+            chain = [node]
+            chains.append(chain)
+        chain_of[node.id] = chain
+    return chains
+
+
+def describe_pipeline(nodes: list[PipelineNode]) -> list[str]:
+    """One line per fused chain or other node, for the log."""
+    chains = {chain[0].id: chain for chain in pipeline_chains(nodes)}
+    lines = []
+    for node in nodes:
+        if node.id in chains:
+            chain = chains[node.id]
+            head = "read" if node.stage == "clean" else f"copy of {node.input}"
+            lines.append(f"{head} -> {' -> '.join(member.id for member in chain)} (in place)")
+        elif node.output != "recording":
+            lines.append(f"{node.id}({node.input})" + (f" -> {node.params['suffix']}" if node.stage == "write" else ""))
+    return lines
+
+
+def run_pipeline(
+    input_path: Path,
+    output_dir: Path,
+    summary_dir: Path,
+    cfg: dict[str, Any],
+    cache: StageCache | None = None,
+    timer: StageTimer | None = None,
+) -> dict[str, Any]:
+    """Run ``build_pipeline(cfg)`` on one recording: one read, fused in-place chains, one write."""
+    timer = timer if timer is not None else StageTimer(input_path.name)
+    nodes = build_pipeline(cfg)
+    by_id = {node.id: node for node in nodes}
+    chains = {chain[0].id: chain for chain in pipeline_chains(nodes)}
+    channels = cfg["channels"]
+    values: dict[str, Any] = {}
+    metas: dict[str, dict[str, Any]] = {}
+    pending: list[PipelineNode] = []
+    entry: dict[str, Any] = {}
+    hits = misses = 0
+
+    for node in nodes:
+        if node.id in chains:
+            chain = chains[node.id]
+            stages = [(member.stage, member.params) for member in chain]
+            labels = [member.id for member in chain]
+            if node.stage == "clean":
+                rec, meta = run_preprocess_stages(input_path, cfg, cache, timer, stages, labels)
+            else:
+                parent = metas[node.input]
+                rec, meta = run_stage_chain(
+                    values[node.input], stages, cfg, cache, timer, parent.get("cache_key"), labels, parent
+                )
+            hits, misses = hits + meta["cache_hits"], misses + meta["cache_misses"]
+            for member in chain:
+                values[member.id], metas[member.id] = rec, meta
+        elif node.output == "recording":
+            continue  # ran with its chain
+        elif node.stage == "epoch":
+            rec = values[node.input]
+            with timer.stage(node.id) as row:
+                values[node.id] = Epochs.from_continuous(rec, rec.fs, float(node.params["window_sec"]), float(node.params["overlap_rate"]))
+                row["samples"] = len(values[node.id]) * values[node.id].n_samples
+            metas[node.id] = metas[node.input]
+        elif node.stage in FEATURE_STAGES:
+            source, params = values[node.input], node.params
+            with timer.stage(node.id, len(source)):
+                if node.stage == "psd":
+                    values[node.id] = psd_features(source, params["channels"], float(params["window_sec"]), params["bands"])
+                elif node.stage == "de":
+                    values[node.id] = de_features(
+                        source, params["channels"], params["bands"], int(params["order"]), sos=bool(params["sos"])
+                    )
+                elif node.stage == "wpli":
+                    values[node.id] = wpli_features(
+                        source, params["channels"], params["band"], int(params["order"]), float(params["window_sec"]), float(params["step_sec"])
+                    )
+                else:
+                    values[node.id] = tfr_features(source, params["channels"], float(params["fmin"]), float(params["fmax"]), float(params["fstep"]))
+            pending.append(node)
+        else:
+            pending.append(node)
+
+    file_name = input_path.name
+    base = Path(file_name).stem
+    with timer.stage("write") as row:
+        for node in pending:
+            value = values[node.input] if node.stage == "write" else values[node.id]
+            if node.stage == "write" and node.output is None and by_id[node.input].output == "recording":
+                row["samples"] += len(value)
+                suffix = node.params["suffix"]
+                path = write_table(value.to_frame(), output_dir / f"{base}_{suffix}", node.params["output_format"])
+                summary_name = f"{base}_quality_summary.csv" if suffix == "preprocessed" else f"{base}_{suffix}_quality_summary.csv"
+                rows = write_quality_summary(value, channels, summary_dir / summary_name, file_name, suffix)
+                meta = metas[node.input]
+                gaps = gap_stats(value.time, value.segments)
+                written = catalog_entry(rows, value.fs, _duration(value.time), gaps, meta.get("outlier_counts"))
+                if entry:
+                    entry["stats"] += written["stats"]
+                else:
+                    entry = written
+                print(f"  saved: {path}")
+                print(f"  sampling_rate_hz: {value.fs:.2f}; fixed_outliers: {meta['fixed_count']}")
+            elif node.stage == "write":
+                row["samples"] += len(value) * value.n_samples
+                if len(value) == 0:
+                    print("  epoch skipped: data is too short")
+                    continue
+                path = output_dir / f"{base}_{node.params['suffix']}.csv"
+                if node.params["output_format"] == "csv":
+                    value.to_csv(path)
+                else:
+                    path = write_table(value.to_frame(), path, node.params["output_format"])
+                print(f"  epoch saved: {path}")
+                print(f"  epoch_count: {len(value)}")
+            elif value is None:
+                print(f"  {node.id} skipped: data is too short")
+            else:
+                path = write_table(value, output_dir / f"{base}_{node.id}", cfg.get("output_format", "csv"))
+                print(f"  {node.id} saved: {path} ({value.shape[0]} x {value.shape[1]})")
+
+    trunk = metas[nodes[0].id]
+    return {"fs": trunk["fs"], "fixed_count": trunk["fixed_count"], "cache_hits": hits, "cache_misses": misses, "catalog": entry}
+
+
+def preprocess_file(
+    input_path: Path,
+    output_dir: Path,
+    summary_dir: Path,
+    cfg: dict[str, Any],
+    cache: StageCache | None = None,
+    profile_dir: Path | None = None,
+) -> dict[str, Any]:
+    """Run the preprocess pipeline on one recording in memory (see ``run_pipeline``)."""
+    timer = StageTimer(input_path.name, profile_dir)
+    meta = run_pipeline(input_path, output_dir, summary_dir, cfg, cache, timer)
+    print(f"  timings: {timer.summary_line()}")
+    return {**meta, "timings": timer.rows}
@@ -0,0 +1,313 @@
+"""``Recording`` and ``Epochs`` containers and sampling-rate/gap helpers."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .tables import _append_csv
+
+if TYPE_CHECKING:
+    from .store import RecordingStore
+
+
+GAP_FACTOR = 4.0
+
+
+def _nominal_rate(diffs: np.ndarray, gap_factor: float = GAP_FACTOR) -> tuple[float, float]:
+    """``(fs, period)`` from sampling intervals, leaving out gaps longer than ``gap_factor`` periods."""
+    positive = diffs[diffs > 0]
+    if len(positive) == 0:
+        return 0.0, 0.0
+    period = float(np.median(positive))
+    regular = positive[positive <= gap_factor * period]
+    return float(np.rint(regular / period).sum() / regular.sum()), period
+
+
+def sampling_rate_of(times: np.ndarray, segments: np.ndarray | None = None, gap_factor: float = GAP_FACTOR) -> float:
+    """Robust fs of a time vector (see ``_nominal_rate``); 0.0 if it cannot be estimated."""
+    times = np.asarray(times, dtype=np.float64)
+    if segments is not None and len(segments) > 1:
+        diffs = np.diff(times)
+        diffs[segments[1:, 0] - 1] = np.nan
+    else:
+        diffs = np.diff(times[~np.isnan(times)])
+    return _nominal_rate(diffs, gap_factor)[0]
+
+
+def estimate_sampling_rate(times: np.ndarray, gap_factor: float = GAP_FACTOR) -> tuple[float, np.ndarray]:
+    """Robust fs of a time vector and the indices after which a gap starts: ``(fs, gap_after)``."""
+    diffs = np.diff(np.asarray(times, dtype=np.float64))
+    fs, period = _nominal_rate(diffs, gap_factor)
+    if fs == 0.0:
+        return 0.0, np.empty(0, dtype=np.intp)
+    return fs, np.flatnonzero(diffs > gap_factor * period)
+
+
+def gap_index(times: np.ndarray, gap_factor: float = GAP_FACTOR) -> np.ndarray:
+    """Contiguous runs of a time vector as an ``(n_segments, 2)`` array of ``[start, stop)`` rows."""
+    if len(times) == 0:
+        return np.empty((0, 2), dtype=np.intp)
+    _, gap_after = estimate_sampling_rate(times, gap_factor)
+    bounds = np.concatenate([[0], gap_after + 1, [len(times)]])
+    return np.column_stack([bounds[:-1], bounds[1:]])
+
+
+def gap_stats(times: np.ndarray, segments: np.ndarray) -> dict[str, Any]:
+    """Segment count and the number, total and longest duration (s) of the gaps between them."""
+    gaps = times[segments[1:, 0]] - times[segments[1:, 0] - 1] if len(segments) > 1 else np.empty(0)
+    return {
+        "segments": len(segments),
+        "gap_count": len(gaps),
+        "gap_sec": round(float(gaps.sum()), 4),
+        "max_gap_sec": round(float(gaps.max()), 4) if len(gaps) else 0.0,
+    }
+
+
+def get_sampling_rate(df: pd.DataFrame, time_col: str = "time") -> float:
+    if time_col not in df.columns or len(df) < 2:
+        return 0.0
+    return sampling_rate_of(pd.to_numeric(df[time_col], errors="coerce").to_numpy(dtype=np.float64))
+
+
+# ---Recording---
+# 预处理各步骤直接在 (样本, 通道) 的连续float数组上计算；DataFrame只在读写文件时出现
+
+
+class Recording:
+    """One recording as a C-contiguous ``(n_samples, n_channels)`` float array.
+
+    ``segments`` is the gap index and ``log`` one dict per stage applied so far.
+    """
+
+    __slots__ = ("data", "time", "fs", "channels", "segments", "log")
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        time: np.ndarray,
+        fs: float,
+        channels: list[str],
+        log: list[dict[str, Any]] | None = None,
+        segments: np.ndarray | None = None,
+    ) -> None:
+        self.data = data
+        self.time = time
+        self.fs = fs
+        self.channels = list(channels)
+        self.segments = segments if segments is not None else np.array([[0, len(data)]], dtype=np.intp)
+        self.log = log if log is not None else []
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        channels: list[str] | None = None,
+        fs: float | None = None,
+        dtype: Any = np.float64,
+    ) -> "Recording":
+        """Copy ``channels`` (default: every column except ``time``) into one float matrix."""
+        if channels is None:
+            channels = [col for col in df.columns if col != "time"]
+        signals = df[channels]
+        if not all(pd.api.types.is_float_dtype(kind) for kind in signals.dtypes):
+            signals = signals.apply(pd.to_numeric, errors="coerce")
+        data = np.array(signals.to_numpy(dtype=dtype), dtype=dtype, order="C")
+        segments = None
+        if "time" in df.columns:
+            time = pd.to_numeric(df["time"], errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            segments = gap_index(time) if len(time) else None
+        else:
+            time = np.full(len(df), np.nan)
+        return cls(data, time, get_sampling_rate(df) if fs is None else fs, channels, segments=segments)
+
+    @classmethod
+    def from_raw(cls, df: pd.DataFrame, raw_columns: dict[str, str], dtype: Any = np.float64) -> "Recording":
+        """Build from a raw export: ``raw_columns`` maps source columns to ``time``/channel names."""
+        missing = [col for col in raw_columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"missing raw columns: {missing}")
+        sources = [col for col, name in raw_columns.items() if name != "time"]
+        frame = df[sources].set_axis([raw_columns[col] for col in sources], axis=1)
+        time_cols = [col for col, name in raw_columns.items() if name == "time"]
+        if time_cols:
+            frame.insert(0, "time", df[time_cols[0]])
+        rec = cls.from_frame(frame, dtype=dtype)
+        rec.fs = sampling_rate_of(rec.time)
+        return rec
+
+    @classmethod
+    def from_store(cls, store: RecordingStore, dtype: Any = np.float64, gap_factor: float = GAP_FACTOR) -> "Recording":
+        """Load an ingested store; the gap index is built here and ``fs`` leaves the gaps out."""
+        time = np.array(store.time, dtype=np.float64)
+        segments = gap_index(time, gap_factor) if len(time) else None
+        fs = sampling_rate_of(time, segments, gap_factor) if segments is not None and len(segments) > 1 else store.fs
+        rec = cls(store.samples.astype(dtype), time, fs, store.channels, segments=segments)
+        rec.record("ingest", source=store.meta["source"], source_sha256=store.meta["source_sha256"])
+        return rec
+
+    @classmethod
+    def read(
+        cls,
+        source: str | Path | RecordingStore,
+        t_start: float,
+        t_stop: float,
+        channels: list[str] | None = None,
+        dtype: Any = np.float64,
+    ) -> "Recording":
+        """Load ``t_start <= time < t_stop`` seconds of an ingested store without loading the rest
+        (see ``RecordingStore.read``)."""
+        from .store import RecordingStore
+
+        store = source if isinstance(source, RecordingStore) else RecordingStore.open(source)
+        return store.read(t_start, t_stop, channels, dtype)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def copy(self) -> "Recording":
+        log = [dict(entry) for entry in self.log]
+        return Recording(self.data.copy(), self.time.copy(), self.fs, self.channels, log, self.segments.copy())
+
+    def record(self, stage: str, **params: Any) -> None:
+        self.log.append({"stage": stage, **params})
+
+    def indices(self, channels: list[str]) -> list[int]:
+        """Column indices of the requested channels that this recording has."""
+        return [self.channels.index(channel) for channel in channels if channel in self.channels]
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame(self.data, columns=self.channels)
+        frame.insert(0, "time", self.time)
+        return frame
+
+
+def _epoch_geometry(fs: float, window_sec: float, overlap_rate: float) -> tuple[int, int]:
+    """Return ``(samples_per_epoch, step_size)`` after validating the epoch settings."""
+    if window_sec <= 0:
+        raise ValueError("epoch.window_sec must be greater than 0")
+    if overlap_rate < 0 or overlap_rate >= 1:
+        raise ValueError("epoch.overlap_rate must be >= 0 and < 1")
+    if fs <= 0:
+        raise ValueError("sampling rate is invalid")
+
+    samples_per_epoch = int(round(window_sec * fs))
+    if samples_per_epoch <= 0:
+        raise ValueError("window is shorter than one sample")
+
+    step_size = max(1, int(round(samples_per_epoch * (1 - overlap_rate))))
+    return samples_per_epoch, step_size
+
+
+def _strided_epochs(data: np.ndarray, samples_per_epoch: int, step_size: int) -> np.ndarray:
+    """``(n_epochs, samples_per_epoch, n_columns)`` view of a ``(n_samples, n_columns)`` array."""
+    if len(data) < samples_per_epoch:
+        return np.empty((0, samples_per_epoch, data.shape[1]), dtype=data.dtype)
+    windows = np.lib.stride_tricks.sliding_window_view(data, samples_per_epoch, axis=0)
+    return windows[::step_size].transpose(0, 2, 1)
+
+
+def _segment_epochs(
+    data: np.ndarray, segments: np.ndarray | None, samples_per_epoch: int, step_size: int
+) -> np.ndarray:
+    """``_strided_epochs`` restarted in every segment, so no epoch spans a gap."""
+    if segments is None or len(segments) <= 1:
+        return _strided_epochs(data, samples_per_epoch, step_size)
+    starts = np.concatenate(
+        [np.arange(start, stop - samples_per_epoch + 1, step_size) for start, stop in segments]
+    ).astype(np.intp)
+    if len(starts) == 0:
+        return np.empty((0, samples_per_epoch, data.shape[1]), dtype=data.dtype)
+    return _strided_epochs(data, samples_per_epoch, 1)[starts]
+
+
+class Epochs:
+    """Epoched data as a ``(n_epochs, n_samples, n_columns)`` array, a strided view where possible.
+
+    The long ``epoch_id`` table is only built by ``to_frame``/``to_csv``.
+    """
+
+    __slots__ = ("values", "columns", "fs", "dtypes", "time")
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        columns: list[str],
+        fs: float,
+        dtypes: dict[str, Any] | None = None,
+        time: np.ndarray | None = None,
+    ) -> None:
+        self.values = values
+        self.columns = list(columns)
+        self.fs = fs
+        self.dtypes = dtypes or {}
+        self.time = time
+
+    @classmethod
+    def from_continuous(
+        cls,
+        df: pd.DataFrame | Recording,
+        fs: float,
+        window_sec: float,
+        overlap_rate: float,
+        segments: np.ndarray | None = None,
+    ) -> "Epochs":
+        """``segments`` defaults to the recording's gap index (none for a DataFrame)."""
+        samples_per_epoch, step_size = _epoch_geometry(fs, window_sec, overlap_rate)
+        if isinstance(df, Recording):
+            segments = df.segments if segments is None else segments
+            values = _segment_epochs(df.data, segments, samples_per_epoch, step_size)
+            time = _segment_epochs(df.time[:, None], segments, samples_per_epoch, step_size)[:, :, 0]
+            return cls(values, df.channels, fs, time=time)
+        values = _segment_epochs(df.to_numpy(), segments, samples_per_epoch, step_size)
+        return cls(values, list(df.columns), fs, dict(df.dtypes))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, fs: float) -> "Epochs":
+        """Rebuild the array from an ``*_epoched.csv`` table (equal-length, contiguous epochs)."""
+        sizes = df.groupby("epoch_id", sort=False).size()
+        if sizes.nunique() > 1:
+            raise ValueError("epochs have different lengths")
+        data = df.drop(columns="epoch_id")
+        samples = int(sizes.iloc[0]) if len(sizes) else 0
+        values = data.to_numpy().reshape(len(sizes), samples, data.shape[1])
+        return cls(values, list(data.columns), fs, dict(data.dtypes))
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def n_samples(self) -> int:
+        return self.values.shape[1]
+
+    def channel_values(self, channels: list[str]) -> np.ndarray:
+        """``(n_epochs, n_samples, len(channels))`` array for the given columns."""
+        return self.values[:, :, [self.columns.index(channel) for channel in channels]]
+
+    def iter_frames(self) -> Iterator[tuple[int, pd.DataFrame]]:
+        """Yield ``(epoch_id, epoch_frame)`` like ``df.groupby("epoch_id")`` on the long table."""
+        for epoch_id in range(len(self)):
+            frame = pd.DataFrame(self.values[epoch_id], columns=self.columns)
+            if self.time is not None:
+                frame.insert(0, "time", self.time[epoch_id])
+            yield epoch_id, frame
+
+    def to_frame(self, start: int = 0, stop: int | None = None) -> pd.DataFrame:
+        values = self.values[start:stop]
+        if len(values) == 0:
+            return pd.DataFrame()
+        frame = pd.DataFrame(values.reshape(-1, len(self.columns)), columns=self.columns)
+        frame = frame.astype({col: dtype for col, dtype in self.dtypes.items() if col in frame.columns})
+        if self.time is not None:
+            frame.insert(0, "time", self.time[start:stop].reshape(-1))
+        first = start if start >= 0 else len(self) + start
+        frame["epoch_id"] = np.repeat(np.arange(first, first + len(values)), self.n_samples)
+        return frame
+
+    def to_csv(self, path: Path, block: int = 512) -> None:
+        """Write the long table ``block`` epochs at a time."""
+        for start in range(0, len(self), block):
+            _append_csv(self.to_frame(start, start + block), path, first=start == 0)
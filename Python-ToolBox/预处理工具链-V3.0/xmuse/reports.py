@@ -0,0 +1,210 @@
+"""Quality summaries and per-stage timing reports."""
+
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .config import ensure_dir
+from .recording import Recording, gap_index, gap_stats, get_sampling_rate
+from .tables import write_csv_atomic
+
+
+def _quality_row(
+    source_file: str,
+    stage: str,
+    channel: str,
+    samples: int,
+    fs: float,
+    stats: dict[str, float] | None,
+    gaps: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """One quality-summary row; ``stats`` is None when the channel is missing."""
+    row: dict[str, Any] = {
+        "source_file": source_file,
+        "stage": stage,
+        "channel": channel,
+        "exists": stats is not None,
+        "samples": samples,
+        "missing_count": "",
+        "mean": "",
+        "std": "",
+        "min": "",
+        "max": "",
+        "sampling_rate_hz": round(fs, 4) if fs else "",
+        "segments": "",
+        "gap_count": "",
+        "gap_sec": "",
+        "max_gap_sec": "",
+    }
+    if gaps is not None:
+        row.update(gaps)
+    if stats is None:
+        return row
+
+    row["missing_count"] = int(stats["missing"])
+    if stats["count"] > 0:
+        for key in ("mean", "std", "min", "max"):
+            row[key] = round(float(stats[key]), 6)
+    return row
+
+
+def write_quality_summary(
+    df: pd.DataFrame | Recording,
+    channels: list[str],
+    output_path: Path,
+    source_file: str,
+    stage: str,
+) -> list[dict[str, Any]]:
+    """Save a compact quality-check table for one processed file; returns its rows."""
+    rows: list[dict[str, Any]] = []
+    if isinstance(df, Recording):
+        gaps = gap_stats(df.time, df.segments)
+        for channel in channels:
+            if channel not in df.channels:
+                rows.append(_quality_row(source_file, stage, channel, len(df), df.fs, None, gaps))
+                continue
+            data = df.data[:, df.channels.index(channel)]
+            valid = data[~np.isnan(data)]
+            stats = {
+                "count": len(valid),
+                "missing": len(data) - len(valid),
+                "mean": valid.mean() if len(valid) else np.nan,
+                "std": valid.std(ddof=1) if len(valid) > 1 else np.nan,
+                "min": valid.min() if len(valid) else np.nan,
+                "max": valid.max() if len(valid) else np.nan,
+            }
+            rows.append(_quality_row(source_file, stage, channel, len(df), df.fs, stats, gaps))
+        write_csv_atomic(pd.DataFrame(rows), output_path)
+        return rows
+
+    fs = get_sampling_rate(df)
+    gaps = None
+    if "time" in df.columns:
+        times = pd.to_numeric(df["time"], errors="coerce").to_numpy(dtype=np.float64)
+        gaps = gap_stats(times, gap_index(times))
+    for channel in channels:
+        if channel not in df.columns:
+            rows.append(_quality_row(source_file, stage, channel, len(df), fs, None, gaps))
+            continue
+
+        data = pd.to_numeric(df[channel], errors="coerce")
+        stats = {
+            "count": int(data.notna().sum()),
+            "missing": int(data.isna().sum()),
+            "mean": data.mean(),
+            "std": data.std(),
+            "min": data.min(),
+            "max": data.max(),
+        }
+        rows.append(_quality_row(source_file, stage, channel, len(df), fs, stats, gaps))
+
+    write_csv_atomic(pd.DataFrame(rows), output_path)
+    return rows
+
+
+# ---Instrumentation---
+# 每个文件每个阶段记录墙钟时间、CPU时间、峰值内存(RSS)增量和每秒样本数，写到quality_summary旁边；
+# --profile时每个阶段另外用cProfile采样，存成.pstats
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far (MB); None where ``resource`` is missing (Windows)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    """Per-stage wall/CPU time, peak RSS delta and samples/s of one file, collected in ``rows``."""
+
+    def __init__(self, file_name: str, profile_dir: Path | None = None) -> None:
+        self.file_name = file_name
+        self.profile_dir = profile_dir
+        self.rows: list[dict[str, Any]] = []
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, samples: int = 0) -> Iterator[dict[str, Any]]:
+        row: dict[str, Any] = {"file": self.file_name, "stage": stage, "samples": samples}
+        profiler = cProfile.Profile() if self.profile_dir is not None else None
+        rss_before = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield row
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            rss_after = peak_rss_mb()
+            row.update(
+                wall_s=round(wall, 6),
+                cpu_s=round(cpu, 6),
+                peak_rss_mb=round(rss_after, 1) if rss_after is not None else "",
+                peak_rss_delta_mb=round(rss_after - rss_before, 1) if rss_after is not None else "",
+                samples_per_s=round(row["samples"] / wall) if wall > 0 and row["samples"] else "",
+            )
+            self.rows.append(row)
+            if profiler is not None:
+                ensure_dir(self.profile_dir)
+                profiler.dump_stats(str(self.profile_dir / f"{Path(self.file_name).stem}.{stage}.pstats"))
+
+    def summary_line(self) -> str:
+        totals: dict[str, float] = {}
+        for row in self.rows:
+            totals[row["stage"]] = totals.get(row["stage"], 0.0) + row["wall_s"]
+        return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in totals.items())
+
+
+def write_stage_timings(results: dict[str, Any], summary_dir: Path, per_file: bool = False) -> list[Path]:
+    """Write the ``timings`` rows of every file to ``stage_timings.csv``/``.json``; returns the json paths.
+
+    ``per_file`` writes ``<file stem>_stage_timings.*`` instead, for concurrent jobs.
+    """
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for name, meta in results.items():
+        rows = meta.get("timings", []) if meta else []
+        if rows:
+            key = f"{Path(name).stem}_stage_timings" if per_file else "stage_timings"
+            groups.setdefault(key, []).extend(rows)
+    return [_write_timing_rows(rows, summary_dir / key) for key, rows in groups.items()]
+
+
+def _write_timing_rows(rows: list[dict[str, Any]], base_path: Path) -> Path:
+    write_csv_atomic(pd.DataFrame(rows), base_path.with_suffix(".csv"))
+    stages: dict[str, dict[str, float]] = {}
+    for row in rows:
+        total = stages.setdefault(row["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "samples": 0})
+        total["wall_s"] = round(total["wall_s"] + row["wall_s"], 6)
+        total["cpu_s"] = round(total["cpu_s"] + row["cpu_s"], 6)
+        total["samples"] += row["samples"]
+    files: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        files.setdefault(row["file"], []).append({key: value for key, value in row.items() if key != "file"})
+    json_path = base_path.with_suffix(".json")
+    fd, tmp_name = tempfile.mkstemp(dir=json_path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"files": files, "stages": stages}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_name, json_path)
+    return json_path
@@ -0,0 +1,252 @@
+"""Warm worker daemon (``serve``)."""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+
+from .batch import resolve_jobs, run_convert, run_direct_data, run_ingest, run_preprocess
+from .config import DEFAULT_CONFIG, _json_default, ensure_dir, load_config, project_path
+
+
+# ---Serve mode---
+# serve常驻一个已导入pandas/scipy/mne的进程池，通过本地UNIX socket或spool目录接收任务(命令+配置+文件)，
+# 每次处理不再付解释器启动和导入的开销；客户端在只依赖标准库的xmuse_client.py里(submit命令也调用它)
+
+
+# 每个命令的文件列表在配置中的位置：(配置节, 文件列表键, 输入目录键)
+_JOB_FILES = {
+    "preprocess": ("preprocess", "files", "preprocess_input_dir"),
+    "ingest": ("preprocess", "files", "preprocess_input_dir"),
+    "direct": ("direct_data", "files", "direct_input_dir"),
+    "convert": ("convert", "edf_files", "convert_input_dir"),
+}
+JOB_COMMANDS = tuple(_JOB_FILES)  # same as xmuse_client.JOB_COMMANDS; the client does not import the toolkit
+_CONFIG_CACHE: dict[str, tuple[float, dict[str, Any]]] = {}
+
+
+def _cached_config(config_path: str | Path) -> dict[str, Any]:
+    """``load_config`` once per worker, again only when the file's mtime changes."""
+    path = str(Path(config_path).resolve())
+    mtime = os.stat(path).st_mtime
+    cached = _CONFIG_CACHE.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_config(path))
+        _CONFIG_CACHE[path] = cached
+    return json.loads(json.dumps(cached[1]))
+
+
+def job_config(config: dict[str, Any], command: str, files: list[str]) -> dict[str, Any]:
+    """``config`` restricted to ``files``: names in the configured input dir, or paths in one directory."""
+    if not files:
+        return config
+    parents = {str(Path(name).parent) for name in files if Path(name).parent != Path(".")}
+    if len(parents) > 1:
+        raise ValueError("the files of one job must be in one directory")
+    directory = parents.pop() if parents else None
+    names = [Path(name).name for name in files]
+    edf = [name for name in names if name.lower().endswith(".edf")]
+    other = [name for name in names if not name.lower().endswith(".edf")]
+
+    section, key, dir_key = _JOB_FILES[command]
+    if command == "convert":
+        base = Path(directory) if directory else project_path(config["paths"][dir_key])
+        config["convert"]["edf_files"] = edf
+        config["convert"]["csv_to_mat_files"] = [str(base / name) for name in other]
+    elif command == "ingest":
+        config["preprocess"]["files"] = other
+        config["convert"]["edf_files"] = edf
+    else:
+        config[section][key] = names
+    if directory:
+        config["paths"][dir_key] = directory
+        if command == "ingest":
+            config["paths"]["convert_input_dir"] = directory
+    # an explicitly named file that is not there fails the job instead of being skipped
+    base = Path(directory) if directory else None
+    missing = []
+    for name in names:
+        key_dir = "convert_input_dir" if name.lower().endswith(".edf") and command == "ingest" else dir_key
+        path = (base or project_path(config["paths"][key_dir])) / name
+        if not path.exists():
+            missing.append(str(path))
+    if missing:
+        raise FileNotFoundError(f"missing file(s): {', '.join(missing)}")
+    return config
+
+
+def _warm_worker() -> None:
+    """Pool initializer: pay the heavy imports once per worker instead of once per job."""
+    import scipy.io  # noqa: F401
+    import scipy.signal  # noqa: F401
+
+    for optional in ("pyarrow", "h5py", "mne"):
+        try:
+            __import__(optional)
+        except ImportError:
+            pass
+
+
+def run_job(job: dict[str, Any]) -> dict[str, Any]:
+    """Execute one job in a worker: ``{"command", "config", "files", "options"}`` -> response."""
+    started = time.time()
+    log = io.StringIO()
+    response: dict[str, Any] = {"id": job.get("id"), "ok": False, "error": "", "started": started}
+    try:
+        command = job["command"]
+        if command not in JOB_COMMANDS:
+            raise ValueError(f"unknown command {command!r}; expected one of {JOB_COMMANDS}")
+        config = job_config(_cached_config(job.get("config") or DEFAULT_CONFIG), command, job.get("files") or [])
+        options = job.get("options") or {}
+        with contextlib.redirect_stdout(log):
+            if command == "preprocess":
+                summary = run_preprocess(
+                    config,
+                    stream=bool(options.get("stream", False)),
+                    jobs=1,
+                    cache_dir=options.get("cache_dir"),
+                    profile=bool(options.get("profile", False)),
+                    per_file_timings=True,
+                )
+            elif command == "ingest":
+                summary = run_ingest(config, jobs=1)
+            elif command == "direct":
+                summary = run_direct_data(config, jobs=1)
+            else:
+                summary = run_convert(config, jobs=1)
+        response["summary"] = summary
+        response["ok"] = summary["failed"] == 0
+        if not response["ok"]:
+            response["error"] = "; ".join(f"{name}: {error}" for name, error in summary["failures"].items())
+    except Exception as exc:
+        response["error"] = f"{type(exc).__name__}: {exc}"
+    response["log"] = log.getvalue()
+    response["run_s"] = time.time() - started
+    return response
+
+
+class JobServer:
+    """Warm ``ProcessPoolExecutor`` fed from a UNIX socket or a spool directory, one JSON job at a time."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        self.started = time.time()
+        self.jobs_done = 0
+        # start every worker now, so the first job does not pay the imports either
+        for future in [self.pool.submit(os.getpid) for _ in range(workers)]:
+            future.result()
+
+    def handle(self, job: dict[str, Any]) -> dict[str, Any]:
+        received = time.time()
+        if job.get("command") == "ping":
+            uptime = received - self.started
+            return {"id": job.get("id"), "ok": True, "workers": self.workers, "jobs_done": self.jobs_done, "uptime_s": uptime}
+        try:
+            response = self.pool.submit(run_job, job).result()
+        except Exception as exc:  # worker process died
+            error = f"{type(exc).__name__}: {exc}"
+            response = {"id": job.get("id"), "ok": False, "error": error, "log": "", "started": received, "run_s": 0.0}
+        self.jobs_done += 1
+        response["queue_s"] = max(0.0, response.pop("started") - received)
+        response["server_s"] = time.time() - received
+        label = ", ".join(job.get("files") or []) or "configured files"
+        print(f"[serve] {job.get('command')} ({label}): {'ok' if response['ok'] else 'failed'} in {response['server_s']:.2f}s")
+        return response
+
+    def serve_socket(self, socket_path: Path) -> None:
+        import socket
+        import socketserver
+
+        if socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(socket_path))
+            except OSError:
+                socket_path.unlink()  # stale socket of a server that is gone
+            else:
+                raise RuntimeError(f"a server is already listening on {socket_path}")
+            finally:
+                probe.close()
+        server_ref = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                line = self.rfile.readline()
+                try:
+                    job = json.loads(line)
+                except ValueError as exc:
+                    response: dict[str, Any] = {"ok": False, "error": f"bad request: {exc}"}
+                else:
+                    response = server_ref.handle(job)
+                self.wfile.write(json.dumps(response, default=_json_default).encode("utf-8") + b"\n")
+
+        ensure_dir(socket_path.parent)
+        with socketserver.ThreadingUnixStreamServer(str(socket_path), Handler) as server:
+            os.chmod(socket_path, 0o600)
+            print(f"[serve] {self.workers} warm workers listening on {socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                socket_path.unlink(missing_ok=True)
+
+    def serve_spool(self, spool_dir: Path, poll_sec: float = 0.2) -> None:
+        incoming, running, done = spool_dir / "incoming", spool_dir / "running", spool_dir / "done"
+        for directory in (incoming, running, done):
+            ensure_dir(directory)
+        print(f"[serve] {self.workers} warm workers watching {incoming}")
+        with ThreadPoolExecutor(max_workers=self.workers) as dispatch:
+            while True:
+                for path in sorted(incoming.glob("*.json"), key=lambda p: p.stat().st_mtime):
+                    claimed = running / path.name
+                    try:
+                        os.replace(path, claimed)
+                    except FileNotFoundError:
+                        continue
+                    dispatch.submit(self._spool_job, claimed, done)
+                time.sleep(poll_sec)
+
+    def _spool_job(self, claimed: Path, done: Path) -> None:
+        try:
+            with open(claimed, encoding="utf-8") as f:
+                job = json.load(f)
+        except ValueError as exc:
+            job, response = {"id": claimed.stem}, {"id": claimed.stem, "ok": False, "error": f"bad request: {exc}"}
+        else:
+            job.setdefault("id", claimed.stem)
+            response = self.handle(job)
+        fd, tmp_name = tempfile.mkstemp(dir=done, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(response, f, default=_json_default)
+        os.replace(tmp_name, done / f"{job['id']}.json")
+        claimed.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.pool.shutdown(cancel_futures=True)
+
+
+def run_serve(
+    config: dict[str, Any], jobs: int | None = None, socket_path: str | None = None, spool_dir: str | None = None
+) -> None:
+    from xmuse_client import resolve_transport
+
+    workers = resolve_jobs(config, jobs)
+    kind, location = resolve_transport(config, socket_path, spool_dir)
+    server = JobServer(workers)
+    try:
+        if kind == "socket":
+            server.serve_socket(location)
+        else:
+            server.serve_spool(location)
+    except KeyboardInterrupt:
+        print("[serve] stopped")
+    finally:
+        server.close()
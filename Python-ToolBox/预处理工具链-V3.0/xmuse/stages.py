@@ -0,0 +1,415 @@
+"""Preprocessing stages on ``Recording`` arrays."""
+
+from __future__ import annotations
+
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from .recording import GAP_FACTOR, Epochs, Recording, estimate_sampling_rate, gap_index, sampling_rate_of
+
+
+def _stage_input(
+    df: pd.DataFrame | Recording, channels: list[str], fs: float, inplace: bool
+) -> tuple[Recording, list[int]]:
+    """The recording a stage works on and the column indices of ``channels`` in it."""
+    if isinstance(df, Recording):
+        rec = df if inplace else df.copy()
+    else:
+        rec = Recording.from_frame(df, [channel for channel in channels if channel in df.columns], fs)
+    return rec, rec.indices(channels)
+
+
+def _stage_output(df: pd.DataFrame | Recording, rec: Recording) -> pd.DataFrame | Recording:
+    """Hand back what the caller passed in: the recording, or a copy of the frame with new values."""
+    if isinstance(df, Recording):
+        return rec
+    out = df.copy(deep=False)
+    for j, channel in enumerate(rec.channels):
+        out[channel] = rec.data[:, j]
+    return out
+
+
+def _fill_nan(values: np.ndarray) -> bool:
+    """Linearly interpolate NaNs in a 1-D array in place, holding the edge values; False if all NaN."""
+    missing = np.isnan(values)
+    if not missing.any():
+        return True
+    if missing.all():
+        return False
+    index = np.arange(len(values))
+    values[missing] = np.interp(index[missing], index[~missing], values[~missing])
+    return True
+
+
+def _fill_nan_segments(values: np.ndarray, segments: np.ndarray) -> bool:
+    """``_fill_nan`` within each segment, never across a gap; False if the whole array is NaN."""
+    if len(segments) <= 1:
+        return _fill_nan(values)
+    filled = [_fill_nan(values[start:stop]) for start, stop in segments]
+    return any(filled)
+
+
+def clean_eeg_frame(
+    df: pd.DataFrame | Recording,
+    raw_columns: dict[str, str],
+    inplace: bool = False,
+    gap_factor: float = GAP_FACTOR,
+) -> pd.DataFrame | Recording:
+    """Keep ``raw_columns`` under their new names, drop all-empty rows and start time at 0."""
+    if isinstance(df, Recording):
+        rec = df if inplace else df.copy()
+        keep = ~np.isnan(rec.data).all(axis=1) if rec.data.shape[1] else np.ones(len(rec), dtype=bool)
+        if not keep.all():
+            rec.data = np.ascontiguousarray(rec.data[keep])
+            rec.time = rec.time[keep]
+        if len(rec):
+            rec.time = rec.time - rec.time[0]
+        rec.segments = gap_index(rec.time, gap_factor) if len(rec) else np.empty((0, 2), dtype=np.intp)
+        rec.fs = sampling_rate_of(rec.time, rec.segments, gap_factor)
+        rec.record("clean", dropped_rows=int((~keep).sum()), segments=len(rec.segments))
+        return rec
+
+    missing = [col for col in raw_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"missing raw columns: {missing}")
+
+    cleaned = df[list(raw_columns)].rename(columns=raw_columns).copy()
+    channels = [col for col in raw_columns.values() if col != "time"]
+    cleaned.dropna(subset=channels, how="all", inplace=True)
+    cleaned.reset_index(drop=True, inplace=True)
+
+    if "time" in cleaned.columns and not cleaned.empty:
+        cleaned["time"] = pd.to_numeric(cleaned["time"], errors="coerce")
+        cleaned["time"] = cleaned["time"] - cleaned["time"].iloc[0]
+    return cleaned
+
+
+def _resample_ratio(grid_hz: float, target_hz: float | None) -> tuple[int, int]:
+    """``(up, down)`` of the polyphase resampler taking ``grid_hz`` to ``target_hz``."""
+    if not target_hz or float(target_hz) == grid_hz:
+        return 1, 1
+    ratio = Fraction(float(target_hz) / grid_hz).limit_denominator(1000)
+    if ratio <= 0:
+        raise ValueError(f"invalid resample target_hz: {target_hz}")
+    return ratio.numerator, ratio.denominator
+
+
+def resample_uniform(
+    df: pd.DataFrame | Recording,
+    channels: list[str],
+    target_hz: float | None = None,
+    gap_factor: float = GAP_FACTOR,
+    inplace: bool = False,
+) -> pd.DataFrame | Recording:
+    """Put the samples on a uniform time grid per segment, optionally at a new rate (e.g. 256 -> 128 Hz)."""
+    from scipy.signal import resample_poly
+
+    rec, _ = _stage_input(df, channels, 0.0, inplace)
+    times = rec.time
+    valid = ~np.isnan(times)
+    latest = np.maximum.accumulate(np.where(valid, times, -np.inf))
+    keep = valid & np.concatenate([[True], times[1:] > latest[:-1]])
+    if not keep.all():
+        rec.data, times = rec.data[keep], times[keep]
+
+    fs, gap_after = estimate_sampling_rate(times, gap_factor)
+    if fs <= 0:
+        print("[warn] resample skipped: sampling rate cannot be estimated")
+        rec.time = times
+        rec.segments = np.array([[0, len(times)]], dtype=np.intp)
+        return rec if isinstance(df, Recording) else rec.to_frame()
+    grid_hz = float(max(1, round(fs)))
+    up, down = _resample_ratio(grid_hz, target_hz)
+    out_hz = grid_hz * up / down
+
+    bounds = np.concatenate([[0], gap_after + 1, [len(times)]])
+    data_parts, time_parts = [], []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        run_time, run_data = times[start:stop], rec.data[start:stop]
+        steps = int(np.floor((run_time[-1] - run_time[0]) * grid_hz + 1e-6)) + 1
+        grid = np.arange(steps) / grid_hz
+        regular = np.empty((steps, run_data.shape[1]), dtype=np.float64)
+        for j in range(run_data.shape[1]):
+            values = run_data[:, j].astype(np.float64)
+            _fill_nan(values)
+            regular[:, j] = np.interp(grid, run_time - run_time[0], values)
+        if (up, down) != (1, 1):
+            if steps > 1:
+                regular = resample_poly(regular, up, down, axis=0, padtype="line")
+            else:
+                regular = regular[:1]
+        data_parts.append(regular.astype(rec.data.dtype, copy=False))
+        time_parts.append(run_time[0] + np.arange(len(regular)) / out_hz)
+
+    rec.data = np.ascontiguousarray(np.concatenate(data_parts))
+    rec.time = np.concatenate(time_parts)
+    bounds = np.cumsum([0] + [len(part) for part in time_parts])
+    rec.segments = np.column_stack([bounds[:-1], bounds[1:]])
+    rec.fs = out_hz
+    rec.record(
+        "resample",
+        estimated_hz=round(fs, 4),
+        grid_hz=grid_hz,
+        fs=out_hz,
+        up=up,
+        down=down,
+        gaps=len(gap_after),
+        dropped_rows=int((~keep).sum()),
+    )
+    return rec if isinstance(df, Recording) else rec.to_frame()
+
+
+def apply_baseline(
+    df: pd.DataFrame | Recording,
+    channels: list[str],
+    baseline_window_sec: list[float],
+    fs: float,
+    inplace: bool = False,
+) -> pd.DataFrame | Recording:
+    """Subtract each channel's mean over ``baseline_window_sec`` (NaNs ignored)."""
+    if fs <= 0:
+        return df if inplace and isinstance(df, Recording) else df.copy()
+    rec, cols = _stage_input(df, channels, fs, inplace)
+
+    start = max(0, int(baseline_window_sec[0] * fs))
+    end = min(len(rec), int(baseline_window_sec[1] * fs))
+    if end <= start:
+        end = min(len(rec), start + 1)
+
+    if cols:
+        window = rec.data[start:end, cols]
+        counts = (~np.isnan(window)).sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.nansum(window, axis=0) / counts
+        rec.data[:, cols] -= means
+    rec.record("baseline", window_sec=list(baseline_window_sec), rows=[start, end])
+    return _stage_output(df, rec)
+
+
+@functools.lru_cache(maxsize=64)
+def _butter_sos(fs: float, cutoff: float | tuple[float, ...], btype: str, order: int = 5) -> np.ndarray:
+    """Butterworth design in second-order sections, cached by ``(fs, cutoff, btype, order)``."""
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs
+    normal_cutoff = np.asarray(cutoff) / nyq
+    return butter(order, normal_cutoff, btype=btype, analog=False, output="sos")
+
+
+@functools.lru_cache(maxsize=64)
+def _butter_ba(fs: float, cutoff: float | tuple[float, ...], btype: str, order: int = 5) -> tuple[np.ndarray, np.ndarray]:
+    """The original scripts' Butterworth design as ``(b, a)``, cached like ``_butter_sos``."""
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs
+    normal_cutoff = np.asarray(cutoff) / nyq
+    return butter(order, normal_cutoff, btype=btype, analog=False)
+
+
+def _butter_filter(
+    data: np.ndarray,
+    fs: float,
+    cutoff: float | list[float],
+    btype: str,
+    order: int = 5,
+    axis: int = 0,
+    design: str = "ba",
+) -> np.ndarray:
+    from scipy.signal import filtfilt, sosfiltfilt
+
+    key = tuple(float(c) for c in cutoff) if isinstance(cutoff, (list, tuple)) else float(cutoff)
+    if design == "sos":
+        return sosfiltfilt(_sos_like(_butter_sos(float(fs), key, btype, order), data), data, axis=axis)
+    b, a = _butter_ba(float(fs), key, btype, order)
+    return filtfilt(b, a, data, axis=axis).astype(data.dtype, copy=False)
+
+
+@functools.lru_cache(maxsize=16)
+def _cascade_sos(fs: float, highpass: float, lowpass: float, notch: tuple[float, ...], order: int = 5) -> np.ndarray:
+    """High-pass, low-pass and band-stop designs stacked into one SOS cascade."""
+    return np.vstack(
+        [
+            _butter_sos(fs, highpass, "high", order),
+            _butter_sos(fs, lowpass, "low", order),
+            _butter_sos(fs, notch, "bandstop", order),
+        ]
+    )
+
+
+def _sos_like(sos: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """float32 data gets float32 coefficients, so scipy keeps the filter state in float32 too."""
+    return sos.astype(np.float32) if data.dtype == np.float32 else sos
+
+
+def filter_chain(values: np.ndarray, fs: float, cfg: dict[str, Any], axis: int = 0) -> np.ndarray:
+    """Apply the configured filter chain to a sample matrix.
+
+    ``filter_design`` picks ``(b, a)`` ``filtfilt`` (default) or SOS; ``filter_mode: "fused"`` is one SOS cascade.
+    """
+    from scipy.signal import sosfiltfilt
+
+    highpass = float(cfg["highpass_hz"])
+    lowpass = float(cfg["lowpass_hz"])
+    notch = tuple(float(f) for f in cfg.get("notch_hz", [49.0, 51.0]))
+    if cfg.get("filter_mode", "sequential") == "fused":
+        # pad like the high-pass stage alone: its slow transient dominates the edges
+        hp_sos = _butter_sos(float(fs), highpass, "high")
+        ntaps = 2 * len(hp_sos) + 1 - min(int((hp_sos[:, 2] == 0).sum()), int((hp_sos[:, 5] == 0).sum()))
+        cascade = _sos_like(_cascade_sos(float(fs), highpass, lowpass, notch), values)
+        return sosfiltfilt(cascade, values, axis=axis, padlen=min(3 * ntaps, values.shape[axis] - 1))
+
+    design = cfg.get("filter_design", "ba")
+    values = _butter_filter(values, fs, highpass, "high", axis=axis, design=design)
+    values = _butter_filter(values, fs, lowpass, "low", axis=axis, design=design)
+    return _butter_filter(values, fs, list(notch), "bandstop", axis=axis, design=design)
+
+
+def resolve_workers(workers: int) -> int:
+    """``0`` means one worker per CPU."""
+    return max(1, os.cpu_count() or 1) if workers == 0 else max(1, workers)
+
+
+def map_segments(func: Callable[[int, int], Any], segments: np.ndarray, workers: int = 1) -> list[Any]:
+    """``func(start, stop)`` for every segment of a gap index, on a thread pool when ``workers > 1``."""
+    bounds = [(int(start), int(stop)) for start, stop in segments]
+    workers = resolve_workers(workers)
+    if workers == 1 or len(bounds) < 2:
+        return [func(start, stop) for start, stop in bounds]
+    with ThreadPoolExecutor(max_workers=min(workers, len(bounds))) as pool:
+        return list(pool.map(lambda bound: func(*bound), bounds))
+
+
+def apply_filters(
+    df: pd.DataFrame | Recording,
+    channels: list[str],
+    cfg: dict[str, Any],
+    fs: float,
+    inplace: bool = False,
+    workers: int = 1,
+) -> pd.DataFrame | Recording:
+    """High-pass, low-pass and band-stop every channel, each segment of the gap index on its own."""
+    if fs <= 0:
+        return df if inplace and isinstance(df, Recording) else df.copy()
+    rec, cols = _stage_input(df, channels, fs, inplace)
+
+    if np.isnan(rec.data[:, cols]).any():
+        cols = [col for col in cols if _fill_nan_segments(rec.data[:, col], rec.segments)]
+    if not cols or len(rec) < 20:
+        return _stage_output(df, rec)
+
+    names = [rec.channels[col] for col in cols]
+
+    def filter_segment(start: int, stop: int) -> bool:
+        try:
+            # (channels, samples), C-contiguous: scipy filters along the last axis without re-laying out the block
+            block = np.ascontiguousarray(rec.data[start:stop, cols].T)
+            rec.data[start:stop, cols] = filter_chain(block, fs, cfg, axis=-1).T
+        except ValueError:
+            if len(rec.segments) == 1:
+                raise
+            rec.data[start:stop, cols] = np.nan
+            return False
+        return True
+
+    try:
+        filtered = map_segments(filter_segment, rec.segments, workers)
+    except ImportError:
+        print("[warn] scipy is not installed; filter step skipped.")
+        return _stage_output(df, rec)
+    except ValueError as exc:
+        print(f"[warn] filter skipped for {', '.join(names)}: {exc}")
+        return _stage_output(df, rec)
+    short = len(filtered) - sum(filtered)
+    if short:
+        print(f"[warn] {short} of {len(filtered)} segments too short to filter; set to NaN")
+    rec.record(
+        "filter",
+        segments=len(filtered),
+        short_segments=short,
+        channels=names,
+        highpass_hz=cfg["highpass_hz"],
+        lowpass_hz=cfg["lowpass_hz"],
+        notch_hz=list(cfg.get("notch_hz", [49.0, 51.0])),
+        filter_mode=cfg.get("filter_mode", "sequential"),
+        filter_design=cfg.get("filter_design", "ba"),
+    )
+    return _stage_output(df, rec)
+
+
+def interpolate_outliers(
+    df: pd.DataFrame | Recording, channels: list[str], threshold: float, inplace: bool = False
+) -> tuple[pd.DataFrame | Recording, dict[str, int], np.ndarray]:
+    """Replace samples with ``|value| > threshold`` by linear interpolation from their neighbours.
+
+    Returns the repaired data, the bad-sample count per channel and the bad-sample mask.
+    """
+    rec, cols = _stage_input(df, channels, 0.0, inplace)
+    whole = cols == list(range(rec.data.shape[1]))
+    block = rec.data if whole else rec.data[:, cols]
+    n_samples, width = block.shape
+    # one pass finds every sample outside [-threshold, threshold]: the bad ones and the NaNs
+    mask = (block >= -threshold) & (block <= threshold)
+    np.logical_not(mask, out=mask)
+    flat = np.flatnonzero(mask)
+    is_nan = np.isnan(block.ravel()[flat])
+    if is_nan.any():
+        mask.ravel()[flat[is_nan]] = False
+    rows, cols_of = np.divmod(flat, width)
+    counts = np.bincount(cols_of[~is_nan], minlength=width)
+
+    # NaNs in a channel with bad samples are filled too, as pandas interpolate did
+    for j in np.flatnonzero(counts):
+        values = block[:, j]
+        missing = rows[cols_of == j]
+        anchors = np.union1d(missing - 1, missing + 1)
+        anchors = anchors[(anchors >= 0) & (anchors < n_samples)]
+        anchors = np.setdiff1d(anchors, missing, assume_unique=True)
+        if len(anchors) == 0:
+            values[missing[~np.isnan(values[missing])]] = np.nan
+            continue
+        values[missing] = np.interp(missing, anchors, values[anchors])
+    if not whole and counts.any():
+        rec.data[:, cols] = block
+
+    per_channel = {rec.channels[col]: int(count) for col, count in zip(cols, counts)}
+    rec.record("outliers", threshold=threshold, fixed=int(counts.sum()), counts=per_channel)
+    return _stage_output(df, rec), per_channel, mask
+
+
+def _scale_values(data: Any, method: str, stats: dict[str, float]) -> Any:
+    if method == "minmax":
+        denom = stats["max"] - stats["min"]
+        return (data - stats["min"]) / denom if denom else data
+    std = stats["std"]
+    return (data - stats["mean"]) / std if std else data - stats["mean"]
+
+
+def scale_channels(
+    df: pd.DataFrame | Recording, channels: list[str], method: str, inplace: bool = False
+) -> pd.DataFrame | Recording:
+    """z-score (``zscore``) or min-max (``minmax``) each channel over the whole recording."""
+    rec, cols = _stage_input(df, channels, 0.0, inplace)
+    for col in cols:
+        values = rec.data[:, col]
+        valid = values[~np.isnan(values)]
+        if len(valid) == 0:
+            continue
+        stats = {
+            "mean": valid.mean(),
+            "std": valid.std(ddof=1) if len(valid) > 1 else np.nan,
+            "min": valid.min(),
+            "max": valid.max(),
+        }
+        values[:] = _scale_values(values, method, stats)
+    rec.record("scale", method=method)
+    return _stage_output(df, rec)
+
+
+def create_epochs(df: pd.DataFrame | Recording, fs: float, window_sec: float, overlap_rate: float) -> pd.DataFrame:
+    return Epochs.from_continuous(df, fs, window_sec, overlap_rate).to_frame()
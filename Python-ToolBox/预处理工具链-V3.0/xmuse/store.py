@@ -0,0 +1,237 @@
+"""Memory-mapped ``.xstore`` recordings and ingest."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .config import ensure_dir, project_path
+from .edf import EdfReader
+from .recording import Recording, gap_index
+from .tables import file_digest
+
+
+# ---Recording store---
+# ingest把原始CSV/EDF一次性转成 <文件名>.xstore 目录：samples.f32 (样本×通道 float32)、time.f64 (从0开始的时间)
+# 和 meta.json (fs、通道名、源文件hash)；之后用np.memmap映射打开，不再解析文本，多个进程共享同一份页缓存
+
+
+STORE_SUFFIX = ".xstore"
+STORE_VERSION = 1
+
+
+def is_store(path: str | Path) -> bool:
+    return (Path(path) / "meta.json").is_file()
+
+
+def store_path(store_dir: Path, source: str | Path) -> Path:
+    return store_dir / f"{Path(source).stem}{STORE_SUFFIX}"
+
+
+class RecordingStore:
+    """Read-only memory-mapped view of an ingested recording."""
+
+    __slots__ = ("path", "meta", "samples", "time")
+
+    def __init__(self, path: Path, meta: dict[str, Any], samples: np.ndarray, time: np.ndarray) -> None:
+        self.path = path
+        self.meta = meta
+        self.samples = samples
+        self.time = time
+
+    @classmethod
+    def open(cls, path: str | Path) -> "RecordingStore":
+        path = Path(path)
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        n_samples, n_channels = int(meta["n_samples"]), len(meta["channels"])
+        if n_samples == 0:
+            return cls(path, meta, np.empty((0, n_channels), dtype=np.float32), np.empty(0))
+        samples = np.memmap(path / meta["samples_file"], dtype=meta["samples_dtype"], mode="r", shape=(n_samples, n_channels))
+        time = np.memmap(path / meta["time_file"], dtype=meta["time_dtype"], mode="r", shape=(n_samples,))
+        return cls(path, meta, samples, time)
+
+    @property
+    def fs(self) -> float:
+        return float(self.meta["fs"])
+
+    @property
+    def channels(self) -> list[str]:
+        return list(self.meta["channels"])
+
+    def __len__(self) -> int:
+        return int(self.meta["n_samples"])
+
+    def channel(self, name: str) -> np.ndarray:
+        """Strided view of one channel column."""
+        return self.samples[:, self.meta["channels"].index(name)]
+
+    def time_sorted(self) -> bool:
+        """True if ``time`` is non-decreasing and has no NaNs; stores from before the
+        ``time_sorted`` meta key are checked once here."""
+        if "time_sorted" not in self.meta:
+            times = np.asarray(self.time)
+            self.meta["time_sorted"] = not (np.isnan(times).any() or (np.diff(times) < 0).any())
+        return bool(self.meta["time_sorted"])
+
+    def span(self, t_start: float, t_stop: float) -> slice | np.ndarray:
+        """Rows with ``t_start <= time < t_stop``; a slice found by binary search when ``time`` is sorted."""
+        if self.time_sorted():
+            start, stop = np.searchsorted(self.time, [t_start, t_stop], side="left")
+            return slice(int(start), max(int(start), int(stop)))
+        return np.flatnonzero((self.time >= t_start) & (self.time < t_stop))
+
+    def read(
+        self, t_start: float, t_stop: float, channels: list[str] | None = None, dtype: Any = np.float64
+    ) -> Recording:
+        """Copy only ``t_start <= time < t_stop`` of ``channels`` (default: all) into a ``Recording``."""
+        names = self.channels if channels is None else list(channels)
+        missing = [name for name in names if name not in self.meta["channels"]]
+        if missing:
+            raise ValueError(f"{self.path.name} has no channels {missing}")
+        rows = self.span(t_start, t_stop)
+        cols = [self.meta["channels"].index(name) for name in names]
+        block = self.samples[rows]
+        data = np.array(block if cols == list(range(block.shape[1])) else block[:, cols], dtype=dtype, order="C")
+        times = np.array(self.time[rows], dtype=np.float64)
+        rec = Recording(data, times, self.fs, names, segments=gap_index(times) if len(times) else None)
+        rec.record("read", source=self.meta["source"], t_start=t_start, t_stop=t_stop)
+        return rec
+
+    def is_current(self, source_path: Path) -> bool:
+        """True if ``source_path`` still has the size and mtime it had when it was ingested."""
+        stat = source_path.stat()
+        return stat.st_size == self.meta["source_size"] and stat.st_mtime == self.meta["source_mtime"]
+
+    def to_frame(self, dtype: Any = np.float64) -> pd.DataFrame:
+        """Copy into a ``time`` + channels frame, the layout ``clean_eeg_frame`` produces."""
+        frame = pd.DataFrame(self.samples.astype(dtype), columns=self.channels)
+        frame.insert(0, "time", np.asarray(self.time, dtype=np.float64))
+        return frame
+
+
+def open_store(path: str | Path) -> RecordingStore:
+    return RecordingStore.open(path)
+
+
+def _write_store(
+    source_path: Path,
+    out_path: Path,
+    channels: list[str],
+    blocks: Iterator[tuple[np.ndarray, np.ndarray]],
+    fs: float | None = None,
+) -> Path:
+    """Write ``(time, samples)`` blocks to a new store directory and swap it in for ``out_path``."""
+    ensure_dir(out_path.parent)
+    stat = source_path.stat()
+    tmp = Path(tempfile.mkdtemp(prefix=f".{out_path.name}_", dir=out_path.parent))
+    tmp.chmod(0o755)  # mkdtemp is owner-only; the store is meant to be shared
+    try:
+        n_samples = 0
+        t0 = None
+        last_time = np.nan
+        diff_sum = 0.0
+        diff_count = 0
+        time_sorted = True
+        with open(tmp / "samples.f32", "wb") as samples_out, open(tmp / "time.f64", "wb") as time_out:
+            for times, samples in blocks:
+                times = np.asarray(times, dtype=np.float64).copy()
+                if t0 is None and len(times):
+                    t0 = float(times[0])
+                times -= t0 if t0 is not None else 0.0
+                if time_sorted and len(times):
+                    head = times[0] < last_time if n_samples else False
+                    time_sorted = not (head or np.isnan(times).any() or (np.diff(times) < 0).any())
+                valid = np.concatenate([[last_time], times[~np.isnan(times)]])
+                valid = valid[~np.isnan(valid)]
+                if len(valid) > 0:
+                    diffs = np.diff(valid)
+                    diffs = diffs[diffs > 0]
+                    diff_sum += float(diffs.sum())
+                    diff_count += len(diffs)
+                    last_time = valid[-1]
+                time_out.write(times.tobytes())
+                samples_out.write(np.ascontiguousarray(samples, dtype=np.float32).tobytes())
+                n_samples += len(times)
+
+        if fs is None:
+            fs = float(diff_count / diff_sum) if n_samples >= 2 and diff_count else 0.0
+        meta = {
+            "version": STORE_VERSION,
+            "source": source_path.name,
+            "source_sha256": file_digest(source_path),
+            "source_size": stat.st_size,
+            "source_mtime": stat.st_mtime,
+            "fs": fs,
+            "channels": channels,
+            "n_samples": n_samples,
+            "t0": t0,
+            "time_sorted": bool(time_sorted),
+            "samples_file": "samples.f32",
+            "samples_dtype": "float32",
+            "time_file": "time.f64",
+            "time_dtype": "float64",
+        }
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    # processes that still map the old files keep reading them until they close
+    if out_path.exists():
+        shutil.rmtree(out_path)
+    tmp.rename(out_path)
+    print(f"  saved: {out_path} ({n_samples} samples x {len(channels)} channels, fs {fs:.2f} Hz)")
+    return out_path
+
+
+def ingest_csv(input_path: Path, store_dir: Path, raw_columns: dict[str, str], chunk_rows: int = 65536) -> Path:
+    """Clean a raw Xmuse/Muse CSV chunk by chunk into ``<store_dir>/<stem>.xstore``."""
+    header = pd.read_csv(input_path, nrows=0).columns
+    missing = [col for col in raw_columns if col not in header]
+    if missing:
+        raise ValueError(f"missing raw columns: {missing}")
+    if "time" not in raw_columns.values():
+        raise ValueError("raw_columns must map one column to 'time'")
+    channels = [col for col in raw_columns.values() if col != "time"]
+
+    def blocks() -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        reader = pd.read_csv(input_path, na_values=[""], usecols=list(raw_columns), chunksize=chunk_rows)
+        for chunk in reader:
+            chunk = chunk[list(raw_columns)].rename(columns=raw_columns)
+            chunk = chunk.dropna(subset=channels, how="all")
+            if chunk.empty:
+                continue
+            chunk = chunk.apply(pd.to_numeric, errors="coerce")
+            yield chunk["time"].to_numpy(dtype=np.float64), chunk[channels].to_numpy(dtype=np.float32)
+
+    return _write_store(input_path, store_path(store_dir, input_path.name), channels, blocks())
+
+
+def ingest_edf(edf_path: Path, store_dir: Path, chunk_rows: int = 65536) -> Path:
+    """Copy an EDF recording (EEG in µV, like ``edf_to_csv``) into ``<store_dir>/<stem>.xstore``."""
+    reader = EdfReader(edf_path)
+    blocks = reader.blocks(chunk_rows // reader.samples_per_record)
+    return _write_store(edf_path, store_path(store_dir, edf_path.name), reader.channels, blocks, reader.fs)
+
+
+def resolve_store_dir(config: dict[str, Any]) -> Path:
+    paths = config["paths"]
+    return project_path(paths.get("store_dir") or Path(paths["output_dir"]) / "store")
+
+
+def _current_store(store: Path, source: Path) -> Path:
+    """Prefer the ingested store unless the source file changed after ingest."""
+    if not is_store(store):
+        return source
+    if source.exists() and not RecordingStore.open(store).is_current(source):
+        print(f"[warn] {source.name} changed after ingest; reading it instead of {store.name}")
+        return source
+    return store
@@ -0,0 +1,277 @@
+"""Bounded-memory streaming preprocess."""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .catalog import _duration, catalog_entry
+from .recording import GAP_FACTOR, Recording, _epoch_geometry, gap_index, gap_stats, sampling_rate_of
+from .reports import StageTimer, _quality_row
+from .stages import _scale_values, apply_filters, interpolate_outliers
+from .tables import _append_csv, write_csv_atomic
+
+
+# ---Streaming mode---
+# 整段文件不进内存：按chunk_rows分块读写，中间结果以float64二进制暂存在输出目录的临时文件夹里，
+# 滤波时每块前后各补pad_sec秒的上下文再截取中间部分，零相位滤波结果与整段filtfilt的差异<1e-6(标准化后单位)
+
+
+def _read_rows(path: Path, start: int, stop: int, width: int) -> np.ndarray:
+    with open(path, "rb") as f:
+        f.seek(start * width * 8)
+        return np.fromfile(f, dtype=np.float64, count=(stop - start) * width).reshape(-1, width)
+
+
+class _RunningStats:
+    """Per-column count/mean/std/min/max accumulated chunk by chunk (pairwise mean/M2 update)."""
+
+    def __init__(self, width: int) -> None:
+        self.count = np.zeros(width)
+        self.missing = np.zeros(width, dtype=np.int64)
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.min = np.full(width, np.inf)
+        self.max = np.full(width, -np.inf)
+
+    def update(self, block: np.ndarray) -> None:
+        valid = ~np.isnan(block)
+        n_b = valid.sum(axis=0).astype(float)
+        self.missing += len(block) - n_b.astype(np.int64)
+        has = n_b > 0
+        if not has.any():
+            return
+
+        safe_n_b = np.where(has, n_b, 1.0)
+        mean_b = np.where(valid, block, 0.0).sum(axis=0) / safe_n_b
+        m2_b = np.where(valid, (block - mean_b) ** 2, 0.0).sum(axis=0)
+        total = self.count + n_b
+        safe_total = np.where(has, total, 1.0)
+        delta = mean_b - self.mean
+        self.mean = np.where(has, self.mean + delta * n_b / safe_total, self.mean)
+        self.m2 = np.where(has, self.m2 + m2_b + delta**2 * self.count * n_b / safe_total, self.m2)
+        self.count = total
+        self.min = np.minimum(self.min, np.where(valid, block, np.inf).min(axis=0))
+        self.max = np.maximum(self.max, np.where(valid, block, -np.inf).max(axis=0))
+
+    def stats(self, j: int) -> dict[str, float]:
+        count = float(self.count[j])
+        empty = count == 0
+        return {
+            "count": count,
+            "missing": int(self.missing[j]),
+            "mean": np.nan if empty else float(self.mean[j]),
+            "std": float(np.sqrt(self.m2[j] / (count - 1))) if count > 1 else np.nan,
+            "min": np.nan if empty else float(self.min[j]),
+            "max": np.nan if empty else float(self.max[j]),
+        }
+
+
+class _StreamEpochWriter:
+    """Cut fixed windows out of consecutive blocks, carrying the unfinished tail between blocks."""
+
+    def __init__(self, path: Path, columns: list[str], samples_per_epoch: int, step_size: int) -> None:
+        self.path = path
+        self.columns = columns
+        self.samples_per_epoch = samples_per_epoch
+        self.step_size = step_size
+        self.buffer = np.empty((0, len(columns)))
+        self.buffer_start = 0
+        self.next_start = 0
+        self.count = 0
+
+    def feed(self, block: np.ndarray) -> None:
+        self.buffer = np.concatenate([self.buffer, block])
+        rows, ids = [], []
+        while self.next_start + self.samples_per_epoch <= self.buffer_start + len(self.buffer):
+            offset = self.next_start - self.buffer_start
+            rows.append(self.buffer[offset : offset + self.samples_per_epoch])
+            ids.append(np.full(self.samples_per_epoch, self.count, dtype=np.int64))
+            self.next_start += self.step_size
+            self.count += 1
+
+        drop = min(self.next_start - self.buffer_start, len(self.buffer))
+        self.buffer = self.buffer[drop:]
+        self.buffer_start += drop
+        if rows:
+            epoched = pd.DataFrame(np.concatenate(rows), columns=self.columns)
+            epoched["epoch_id"] = np.concatenate(ids)
+            _append_csv(epoched, self.path, first=self.count == len(rows))
+
+    def restart(self) -> None:
+        """Drop the unfinished tail: the next window starts at the next fed row, after a gap."""
+        self.buffer_start += len(self.buffer)
+        self.next_start = self.buffer_start
+        self.buffer = self.buffer[:0]
+
+
+def _segments_between(segments: np.ndarray, lo: int, hi: int) -> np.ndarray:
+    """The part of a gap index inside rows ``[lo, hi)``, relative to ``lo``."""
+    clipped = np.clip(segments, lo, hi) - lo
+    return clipped[clipped[:, 1] > clipped[:, 0]]
+
+
+def preprocess_file_streaming(
+    input_path: Path, output_dir: Path, summary_dir: Path, cfg: dict[str, Any], profile_dir: Path | None = None
+) -> dict[str, Any]:
+    """Same stages and outputs as ``preprocess_file`` with peak memory bounded by ``stream.chunk_rows``."""
+    stream_cfg = cfg.get("stream", {})
+    chunk_rows = int(stream_cfg.get("chunk_rows", 65536))
+    pad_sec = float(stream_cfg.get("pad_sec", 30.0))
+    raw_columns = cfg["raw_columns"]
+    channels = cfg["channels"]
+    threshold = float(cfg["amplitude_threshold"])
+    method = cfg.get("scale_method", "zscore")
+    gap_factor = float(cfg.get("gap_factor", GAP_FACTOR))
+    file_name = input_path.name
+    base = Path(file_name).stem
+    timer = StageTimer(file_name, profile_dir)
+
+    header = pd.read_csv(input_path, nrows=0).columns
+    missing = [col for col in raw_columns if col not in header]
+    if missing:
+        raise ValueError(f"missing raw columns: {missing}")
+
+    columns = list(raw_columns.values())
+    width = len(columns)
+    data_columns = [col for col in columns if col != "time"]
+    time_idx = columns.index("time") if "time" in columns else None
+    proc_channels = [ch for ch in channels if ch in columns]
+    ch_idx = [columns.index(ch) for ch in proc_channels]
+
+    with tempfile.TemporaryDirectory(prefix=f".{base}_stream_", dir=output_dir) as tmp_dir:
+        cleaned_tmp = Path(tmp_dir) / "cleaned.f8"
+        times_tmp = Path(tmp_dir) / "time.f8"
+        processed_tmp = Path(tmp_dir) / "processed.f8"
+
+        # pass 1: clean, zero the time axis, then build the gap index and fs from the time column
+        with timer.stage("pass1_read_clean") as row:
+            n_rows = 0
+            t0 = None
+            reader = pd.read_csv(input_path, na_values=[""], usecols=list(raw_columns), chunksize=chunk_rows)
+            with open(cleaned_tmp, "wb") as out, open(times_tmp, "wb") as time_out:
+                for chunk in reader:
+                    chunk = chunk[list(raw_columns)].rename(columns=raw_columns)
+                    chunk = chunk.dropna(subset=data_columns, how="all")
+                    if chunk.empty:
+                        continue
+                    values = chunk.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+                    if time_idx is not None:
+                        if t0 is None:
+                            t0 = values[0, time_idx]
+                        values[:, time_idx] -= t0
+                        time_out.write(values[:, time_idx].tobytes())
+                    out.write(values.tobytes())
+                    n_rows += len(values)
+
+            segments = np.array([[0, n_rows]], dtype=np.intp) if n_rows else np.empty((0, 2), dtype=np.intp)
+            fs, duration_sec, gaps = 0.0, 0.0, None
+            if time_idx is not None and n_rows:
+                times = np.memmap(times_tmp, dtype=np.float64, mode="r")
+                segments = gap_index(times, gap_factor)
+                fs = sampling_rate_of(times, segments, gap_factor)
+                duration_sec = _duration(times)
+                gaps = gap_stats(times, segments)
+                del times
+            row["samples"] = n_rows
+
+        # pass 2: baseline -> filter -> outliers on padded windows, keep only the core rows
+        with timer.stage("pass2_baseline_filter_outliers", n_rows):
+            offsets = np.zeros(len(proc_channels))
+            if fs > 0 and n_rows > 0:
+                baseline_window_sec = cfg["baseline_window_sec"]
+                start = max(0, int(baseline_window_sec[0] * fs))
+                end = min(n_rows, int(baseline_window_sec[1] * fs))
+                if end <= start:
+                    end = min(n_rows, start + 1)
+                head = _read_rows(cleaned_tmp, start, end, width)[:, ch_idx]
+                offsets = pd.DataFrame(head).mean().to_numpy()
+
+            pad = int(pad_sec * fs) if fs > 0 else 0
+            fixed_count = 0
+            outlier_counts: dict[str, int] = {}
+            scale_stats = _RunningStats(len(ch_idx))
+            with open(processed_tmp, "wb") as out:
+                for start in range(0, n_rows, chunk_rows):
+                    stop = min(n_rows, start + chunk_rows)
+                    lo, hi = max(0, start - pad), min(n_rows, stop + pad)
+                    window = _read_rows(cleaned_tmp, lo, hi, width)
+                    window_time = window[:, time_idx] if time_idx is not None else np.full(hi - lo, np.nan)
+                    rec = Recording(
+                        window[:, ch_idx], window_time, fs, proc_channels, segments=_segments_between(segments, lo, hi)
+                    )
+                    if fs > 0:
+                        rec.data -= offsets
+                        apply_filters(rec, channels, cfg, fs, inplace=True)
+                    core = slice(start - lo, stop - lo)
+                    _, counts, bad = interpolate_outliers(rec, channels, threshold, inplace=True)
+                    fixed_count += int(bad[core].sum())
+                    for channel, count in zip(counts, bad[core].sum(axis=0)):
+                        outlier_counts[channel] = outlier_counts.get(channel, 0) + int(count)
+                    window[:, ch_idx] = rec.data
+                    block = window[core]
+                    scale_stats.update(block[:, ch_idx])
+                    out.write(block.tobytes())
+
+        # pass 3: scale with whole-recording statistics, write outputs incrementally
+        with timer.stage("pass3_scale_write_epoch", n_rows):
+            processed_path = output_dir / f"{base}_preprocessed.csv"
+            out_stats = _RunningStats(len(ch_idx))
+            epoch_cfg = cfg.get("epoch", {})
+            epoch_writer = None
+            if epoch_cfg.get("enabled", False):
+                samples_per_epoch, step_size = _epoch_geometry(
+                    fs,
+                    float(epoch_cfg["window_sec"]),
+                    float(epoch_cfg["overlap_rate"]),
+                )
+                epoched_path = output_dir / f"{base}_preprocessed_epoched.csv"
+                epoch_writer = _StreamEpochWriter(epoched_path, columns, samples_per_epoch, step_size)
+            restarts = segments[1:, 0]
+            restart_rows = set(restarts.tolist())
+
+            if n_rows == 0:
+                _append_csv(pd.DataFrame(columns=columns), processed_path, first=True)
+            for start in range(0, n_rows, chunk_rows):
+                block = _read_rows(processed_tmp, start, min(n_rows, start + chunk_rows), width)
+                for j, idx in enumerate(ch_idx):
+                    block[:, idx] = _scale_values(block[:, idx], method, scale_stats.stats(j))
+                _append_csv(pd.DataFrame(block, columns=columns), processed_path, first=start == 0)
+                out_stats.update(block[:, ch_idx])
+                if epoch_writer is not None:
+                    # restart the windows at every segment start so no epoch spans a gap
+                    cuts = restarts[(restarts >= start) & (restarts < start + len(block))] - start
+                    for cut, piece in zip(np.concatenate([[0], cuts]), np.split(block, cuts)):
+                        if start + cut in restart_rows:
+                            epoch_writer.restart()
+                        epoch_writer.feed(piece)
+
+    rows = [
+        _quality_row(
+            file_name,
+            "preprocessed",
+            channel,
+            n_rows,
+            fs,
+            out_stats.stats(proc_channels.index(channel)) if channel in proc_channels else None,
+            gaps,
+        )
+        for channel in channels
+    ]
+    write_csv_atomic(pd.DataFrame(rows), summary_dir / f"{base}_quality_summary.csv")
+
+    print(f"  saved: {processed_path}")
+    print(f"  sampling_rate_hz: {fs:.2f}; fixed_outliers: {fixed_count}")
+    if epoch_writer is not None:
+        if epoch_writer.count == 0:
+            print("  epoch skipped: data is too short")
+        else:
+            print(f"  epoch saved: {epoch_writer.path}")
+            print(f"  epoch_count: {epoch_writer.count}")
+    print(f"  timings: {timer.summary_line()}")
+    entry = catalog_entry(rows, fs, duration_sec, gaps, outlier_counts)
+    return {"fs": fs, "fixed_count": fixed_count, "timings": timer.rows, "catalog": entry}
@@ -0,0 +1,228 @@
+"""Table I/O: csv/parquet/npz/hdf5 tables and raw Xmuse CSV."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+from .config import ensure_dir
+
+
+# ---Table I/O---
+# 中间结果可以写成二进制列存格式，下一步直接按类型读入，不用再解析文本
+
+TABLE_SUFFIXES = {"csv": ".csv", "parquet": ".parquet", "npz": ".npz", "hdf5": ".h5"}
+
+
+def write_table(df: pd.DataFrame, path: Path, output_format: str = "csv") -> Path:
+    """Write ``df`` as ``path`` with the suffix of ``output_format``; returns the written path."""
+    if output_format not in TABLE_SUFFIXES:
+        raise ValueError(f"unknown output_format {output_format!r}, choose from {sorted(TABLE_SUFFIXES)}")
+
+    path = path.with_suffix(TABLE_SUFFIXES[output_format])
+    if output_format == "csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    elif output_format == "parquet":
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as exc:
+            raise ImportError("parquet output needs pyarrow. Install it with: pip install pyarrow") from exc
+    elif output_format == "npz":
+        np.savez(path, **{str(col): df[col].to_numpy() for col in df.columns})
+    else:
+        try:
+            df.to_hdf(path, key="data", mode="w", format="fixed")
+        except ImportError as exc:
+            raise ImportError("hdf5 output needs PyTables. Install it with: pip install tables") from exc
+    return path
+
+
+class TableAppender:
+    """Write a table block by block in ``output_format``; ``close`` returns the written path."""
+
+    def __init__(self, path: Path, output_format: str = "csv") -> None:
+        if output_format not in TABLE_SUFFIXES:
+            raise ValueError(f"unknown output_format {output_format!r}, choose from {sorted(TABLE_SUFFIXES)}")
+        self.path = path.with_suffix(TABLE_SUFFIXES[output_format])
+        self.output_format = output_format
+        self.rows = 0
+        self._parquet_writer: Any = None
+        self._columns: dict[str, list[np.ndarray]] = {}
+
+    def append(self, df: pd.DataFrame) -> None:
+        first = self.rows == 0
+        if self.output_format == "csv":
+            _append_csv(df, self.path, first)
+        elif self.output_format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as exc:
+                raise ImportError("parquet output needs pyarrow. Install it with: pip install pyarrow") from exc
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        elif self.output_format == "npz":
+            for col in df.columns:
+                self._columns.setdefault(str(col), []).append(df[col].to_numpy())
+        else:
+            try:
+                df.to_hdf(self.path, key="data", mode="w" if first else "a", format="table", append=not first)
+            except ImportError as exc:
+                raise ImportError("hdf5 output needs PyTables. Install it with: pip install tables") from exc
+        self.rows += len(df)
+
+    def close(self) -> Path:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self.output_format == "npz":
+            np.savez(self.path, **{col: np.concatenate(parts) for col, parts in self._columns.items()})
+            self._columns = {}
+        return self.path
+
+
+def find_table(path: str | Path) -> Path | None:
+    """Return ``path`` if it exists, else a file with the same stem and another known suffix."""
+    path = Path(path)
+    if path.exists():
+        return path
+    for suffix in TABLE_SUFFIXES.values():
+        candidate = path.with_suffix(suffix)
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def read_table(path: str | Path, **csv_kwargs: Any) -> pd.DataFrame:
+    """Read a table written by ``write_table`` (or an ``.xstore``), picking the reader from the file suffix."""
+    from .store import RecordingStore, is_store
+
+    path = find_table(path) or Path(path)
+    if is_store(path):
+        return RecordingStore.open(path).to_frame()
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        return pd.read_parquet(path)
+    if suffix == ".npz":
+        with np.load(path, allow_pickle=False) as data:
+            return pd.DataFrame({name: data[name] for name in data.files})
+    if suffix in {".h5", ".hdf5"}:
+        return pd.read_hdf(path, key="data")
+    return pd.read_csv(path, **csv_kwargs)
+
+
+def iter_table_chunks(path: str | Path, chunk_rows: int = 262144) -> Iterator[pd.DataFrame]:
+    """Read a ``read_table`` table ``chunk_rows`` rows at a time."""
+    from .store import is_store
+
+    path = find_table(path) or Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+    elif suffix == ".parquet" and not is_store(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        df = read_table(path)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start : start + chunk_rows]
+
+
+def _csv_engine(engine: str = "auto") -> str:
+    """``auto`` picks pyarrow's multithreaded parser when installed, else pandas' C parser."""
+    if engine != "auto":
+        return engine
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return "c"
+    return "pyarrow"
+
+
+def raw_csv_dtypes(raw_columns: dict[str, str], sample_dtype: Any = np.float64) -> dict[str, Any]:
+    """float64 for the column mapped to ``time`` (epoch seconds need it), ``sample_dtype`` for the rest."""
+    return {col: (np.float64 if name == "time" else sample_dtype) for col, name in raw_columns.items()}
+
+
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+
+def sample_dtype(cfg: dict[str, Any]) -> Any:
+    """dtype of the sample matrix for ``preprocess.precision`` (default ``float64``)."""
+    precision = cfg.get("precision", "float64")
+    if precision not in PRECISIONS:
+        raise ValueError(f"unknown precision {precision!r}, choose from {sorted(PRECISIONS)}")
+    return PRECISIONS[precision]
+
+
+def read_raw_csv(
+    path: str | Path,
+    raw_columns: dict[str, str],
+    engine: str = "auto",
+    sample_dtype: Any = np.float64,
+    report: bool = True,
+) -> pd.DataFrame:
+    """Parse only ``raw_columns`` of a raw export, with the dtypes fixed up front."""
+    path = Path(path)
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [col for col in raw_columns if col not in header]
+    if missing:
+        raise ValueError(f"missing raw columns: {missing}")
+
+    engine = _csv_engine(engine)
+    dtypes = raw_csv_dtypes(raw_columns, sample_dtype)
+    started = time.perf_counter()
+    try:
+        df = pd.read_csv(path, usecols=list(raw_columns), dtype=dtypes, na_values=[""], engine=engine)
+    except (ValueError, TypeError) as exc:
+        print(f"[warn] typed parse of {path.name} failed ({exc}); coercing as text")
+        engine = "c"
+        df = pd.read_csv(path, usecols=list(raw_columns), na_values=[""], low_memory=False)
+        df = df.apply(pd.to_numeric, errors="coerce").astype(dtypes)
+    elapsed = time.perf_counter() - started
+    if report:
+        size_mb = path.stat().st_size / (1024 * 1024)
+        rate = size_mb / elapsed if elapsed > 0 else 0.0
+        print(f"  parsed: {size_mb:.1f} MB in {elapsed:.2f}s ({rate:.0f} MB/s, engine={engine})")
+    return df
+
+
+def file_digest(path: str | Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file content, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_csv_atomic(df: pd.DataFrame, output_path: Path) -> None:
+    """``df.to_csv`` through a temporary file in the same directory, so a reader (or a job
+    writing the same report) never sees half a table."""
+    ensure_dir(output_path.parent)
+    fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _append_csv(df: pd.DataFrame, path: Path, first: bool) -> None:
+    if first:
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        df.to_csv(path, index=False, header=False, mode="a", encoding="utf-8")
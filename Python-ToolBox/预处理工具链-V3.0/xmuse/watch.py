@@ -0,0 +1,150 @@
+"""Watch mode: process input files as they arrive."""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+
+from .batch import resolve_jobs
+from .config import DEFAULT_CONFIG, ensure_dir, project_path
+from .serve import _warm_worker, run_job
+
+
+# ---Watch mode---
+# watch轮询preprocess_input_dir和direct_input_dir，文件大小和修改时间在settle_sec秒内不再变化才认为写完，
+# 写完的新文件放进常驻进程池处理；处理过的文件(路径+大小+修改时间)追加到台账，重启后跳过，文件被改写后重新处理
+
+
+class FileLedger:
+    """Append-only JSON-lines ledger of processed inputs, keyed by command and absolute path."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: dict[tuple[str, str], dict[str, Any]] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[(entry["command"], entry["path"])] = entry
+
+    def done(self, command: str, path: Path, stat: os.stat_result) -> bool:
+        entry = self.entries.get((command, str(path)))
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def record(self, command: str, path: Path, stat: os.stat_result, response: dict[str, Any]) -> None:
+        entry = {
+            "command": command,
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "ok": response["ok"],
+            "error": response.get("error", ""),
+            "run_s": round(response.get("run_s", 0.0), 3),
+            "processed": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.entries[(command, str(path))] = entry
+        ensure_dir(self.path.parent)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def settled_files(
+    directory: Path, pattern: str, seen: dict[Path, tuple[int, int, float]], settle_sec: float, now: float
+) -> list[tuple[Path, os.stat_result]]:
+    """Files under ``directory`` whose size and mtime have not changed for ``settle_sec``."""
+    ready = []
+    listed = sorted(directory.glob(pattern))
+    for path in set(seen) - set(listed):
+        del seen[path]  # deleted or renamed away
+    for path in listed:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if not path.is_file():
+            continue
+        previous = seen.get(path)
+        if previous is None:
+            since = stat.st_mtime
+        elif previous[:2] != (stat.st_size, stat.st_mtime_ns):
+            since = now
+        else:
+            since = previous[2]
+        seen[path] = (stat.st_size, stat.st_mtime_ns, since)
+        if stat.st_size > 0 and now - since >= settle_sec:
+            ready.append((path, stat))
+    return ready
+
+
+def run_watch(
+    config: dict[str, Any],
+    config_path: str | Path = DEFAULT_CONFIG,
+    jobs: int | None = None,
+    options: dict[str, Any] | None = None,
+    once: bool = False,
+) -> dict[str, Any]:
+    """Process settled new files of ``preprocess_input_dir`` and ``direct_input_dir`` as they arrive."""
+    watch_cfg = config.get("watch", {})
+    paths = config["paths"]
+    sources = [
+        ("preprocess", project_path(paths["preprocess_input_dir"]), watch_cfg.get("preprocess_glob", "*.csv")),
+        ("direct", project_path(paths["direct_input_dir"]), watch_cfg.get("direct_glob", "*.csv")),
+    ]
+    settle_sec = float(watch_cfg.get("settle_sec", 10.0))
+    poll_sec = float(watch_cfg.get("poll_sec", 2.0))
+    ledger = FileLedger(project_path(watch_cfg.get("ledger", "output/watch_ledger.jsonl")))
+    workers = resolve_jobs(config, jobs)
+    config_path = str(Path(config_path).resolve())
+
+    seen: dict[str, dict[Path, tuple[int, int, float]]] = {command: {} for command, _, _ in sources}
+    running: dict[Any, tuple[str, Path, os.stat_result, float]] = {}
+    counts = {"ok": 0, "failed": 0}
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+    for command, directory, pattern in sources:
+        print(f"[watch] {command}: {directory / pattern}")
+    print(f"[watch] {workers} workers, settle {settle_sec:g}s, ledger {ledger.path} ({len(ledger.entries)} entries)")
+    try:
+        while True:
+            now = time.time()
+            queued = {(command, path) for command, path, _, _ in running.values()}
+            for command, directory, pattern in sources:
+                if not directory.is_dir():
+                    continue
+                for path, stat in settled_files(directory, pattern, seen[command], settle_sec, now):
+                    path = path.resolve()
+                    if (command, path) in queued or ledger.done(command, path, stat):
+                        continue
+                    job = {"command": command, "config": config_path, "files": [str(path)], "options": options or {}}
+                    running[pool.submit(run_job, job)] = (command, path, stat, now)
+                    queued.add((command, path))
+
+            finished = [future for future in running if future.done()]
+            for future in finished:
+                command, path, stat, submitted = running.pop(future)
+                try:
+                    response = future.result()
+                except Exception as exc:  # worker process died
+                    response = {"ok": False, "error": f"{type(exc).__name__}: {exc}", "log": "", "run_s": 0.0}
+                print(response.get("log", ""), end="")
+                status = "ok" if response["ok"] else f"failed: {response['error']}"
+                print(f"[watch] {command} {path.name} {status} in {time.time() - submitted:.1f}s")
+                ledger.record(command, path, stat, response)
+                counts["ok" if response["ok"] else "failed"] += 1
+            settling = any(now - since < settle_sec for files in seen.values() for _, _, since in files.values())
+            if once and not running and not settling:
+                break
+            time.sleep(poll_sec)
+    except KeyboardInterrupt:
+        print("[watch] stopped; unfinished files are processed again on the next start")
+    finally:
+        pool.shutdown(cancel_futures=True)
+    print(f"[watch] {counts['ok']} files ok, {counts['failed']} failed")
+    return counts
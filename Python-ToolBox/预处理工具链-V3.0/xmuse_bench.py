@@ -0,0 +1,850 @@
+"""XMuse toolkit benchmarks.
+对比优化前后的预处理核心函数耗时，命令行选择要跑的基准
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import platform
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+import xmuse as xt
+from xmuse.direct import _direct_lines
+from xmuse.tables import _csv_engine
+
+
+FILTER_CFG = {"highpass_hz": 0.5, "lowpass_hz": 45.0, "notch_hz": [49.0, 51.0]}
+RAW_COLUMNS = {"timestamps": "time", "eeg_1": "CH1", "eeg_2": "CH2", "eeg_3": "CH3", "eeg_4": "CH4"}
+
+
+def pink_noise(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit-variance 1/f noise: white Gaussian noise shaped by 1/sqrt(f) in the frequency domain."""
+    if n < 2:
+        return rng.normal(0, 1, n)
+    spectrum = rng.normal(0, 1, n // 2 + 1) + 1j * rng.normal(0, 1, n // 2 + 1)
+    freqs = np.fft.rfftfreq(n)
+    freqs[0] = freqs[1]
+    noise = np.fft.irfft(spectrum / np.sqrt(freqs), n)
+    return noise / noise.std()
+
+
+def alpha_bursts(t: np.ndarray, rng: np.random.Generator, amplitude: float = 20.0) -> np.ndarray:
+    """8-12 Hz bursts of 0.5-3 s under a Hann envelope, on average one every 5 s."""
+    fs = 1 / (t[1] - t[0]) if len(t) > 1 else 256.0
+    signal = np.zeros(len(t))
+    for _ in range(max(1, int(t[-1] / 5.0)) if len(t) else 0):
+        length = int(rng.uniform(0.5, 3.0) * fs)
+        start = int(rng.integers(0, max(1, len(t) - length)))
+        stop = min(len(t), start + length)
+        freq = rng.uniform(8.0, 12.0)
+        phase = rng.uniform(0, 2 * np.pi)
+        signal[start:stop] += np.hanning(stop - start) * np.sin(2 * np.pi * freq * t[start:stop] + phase)
+    return amplitude * signal
+
+
+def synthetic_recording(
+    n_channels: int,
+    minutes: float,
+    fs: float = 256.0,
+    seed: int = 0,
+    spike_rate: float = 0.001,
+    empty_rate: float = 0.01,
+) -> pd.DataFrame:
+    """Raw Xmuse-like export: epoch ``timestamps`` (with jitter) and ``eeg_1..n`` in µV.
+
+    Each channel is an ~800 µV electrode offset plus 1/f background (10 µV), alpha bursts
+    (20 µV), 50 Hz line noise (10 µV, slowly varying) and ±150-400 µV spikes at ``spike_rate``;
+    ``empty_rate`` of the rows have all EEG columns empty, like Bluetooth dropouts in the app export.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(minutes * 60 * fs)
+    t = np.arange(n) / fs
+    data = {"timestamps": 1.7e9 + t + rng.normal(0, 1e-4, n)}
+    line = 10 * (1 + 0.2 * np.sin(2 * np.pi * t / 60.0)) * np.sin(2 * np.pi * 50 * t)
+    for i in range(n_channels):
+        signal = 800 + rng.normal(0, 20) + 10 * pink_noise(n, rng) + alpha_bursts(t, rng) + line
+        spikes = rng.random(n) < spike_rate
+        signal[spikes] += rng.choice([-1.0, 1.0], spikes.sum()) * rng.uniform(150, 400, spikes.sum())
+        data[f"eeg_{i + 1}"] = signal
+    df = pd.DataFrame(data)
+    empty = rng.random(n) < empty_rate
+    df.loc[empty, [f"eeg_{i + 1}" for i in range(n_channels)]] = np.nan
+    return df
+
+
+def synthetic_cleaned(
+    n_channels: int, minutes: float, fs: float = 256.0, seed: int = 0, spike_rate: float = 0.001
+) -> tuple[pd.DataFrame, float]:
+    """``synthetic_recording`` after the clean step (``time`` + ``CH1..n``, empty rows dropped) and its fs."""
+    raw_columns = {"timestamps": "time", **{f"eeg_{i + 1}": f"CH{i + 1}" for i in range(n_channels)}}
+    cleaned = xt.clean_eeg_frame(synthetic_recording(n_channels, minutes, fs, seed, spike_rate), raw_columns)
+    return cleaned, xt.get_sampling_rate(cleaned)
+
+
+def synthetic_filtered(
+    n_channels: int, minutes: float, seed: int = 0, spike_rate: float = 0.001
+) -> tuple[pd.DataFrame, float]:
+    """``synthetic_cleaned`` through the default filter chain: the input of outlier repair and the feature scripts."""
+    cleaned, fs = synthetic_cleaned(n_channels, minutes, seed=seed, spike_rate=spike_rate)
+    channels = [f"CH{i + 1}" for i in range(n_channels)]
+    return xt.apply_filters(cleaned, channels, FILTER_CFG, fs), fs
+
+
+def synthetic_raw_csv(path: Path, minutes: float, fs: float = 256.0, seed: int = 0) -> Path:
+    """Raw-export-style CSV: ``synthetic_recording`` with 4 EEG columns plus acc/gyro/PPG/battery columns."""
+    rng = np.random.default_rng(seed + 1)
+    df = synthetic_recording(4, minutes, fs, seed)
+    for name in ("acc_x", "acc_y", "acc_z", "gyro_x", "gyro_y", "gyro_z", "ppg_1", "ppg_2", "battery"):
+        df[name] = rng.normal(0, 1, len(df))
+    df.to_csv(path, index=False)
+    return path
+
+
+def synthetic_table_csv(path: Path, minutes: float, seed: int = 0) -> Path:
+    """Preprocessed-style CSV (``time`` + 6 channels at 256 Hz), the usual ``csv_to_mat`` input."""
+    synthetic_filtered(6, minutes, seed=seed)[0].to_csv(path, index=False)
+    return path
+
+
+def synthetic_direct_csv(path: Path, minutes: float, seed: int = 0) -> Path:
+    """Muse-Direct-style export: interleaved EEG/PPG/ACCELEROMETER/GYRO/DRL_REF/BATTERY packets."""
+    rng = np.random.default_rng(seed)
+    seconds = minutes * 60
+    packets = {"EEG": (256.0, 6), "PPG": (64.0, 3), "ACCELEROMETER": (52.0, 3), "GYRO": (52.0, 3), "DRL_REF": (32.0, 2), "BATTERY": (0.1, 3)}
+    parts = []
+    for packet_type, (rate, width) in packets.items():
+        n = max(1, int(seconds * rate))
+        values = rng.normal(800.0, 200.0, (n, width))
+        data = ['"' + ",".join(map(repr, row)) + '"' for row in values.tolist()]
+        stamps = 1_755_000_000_000_000 + (np.arange(n) * 1e6 / rate).astype(np.int64)
+        parts.append(pd.DataFrame({"Timestamp": stamps, "PacketType": packet_type, "Data": data}))
+    df = pd.concat(parts).sort_values("Timestamp", kind="stable")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Timestamp,PacketType,Data\n")
+        f.writelines(f"{t},{p},{d}\n" for t, p, d in zip(df["Timestamp"], df["PacketType"], df["Data"]))
+    return path
+
+
+# (label, unit, physical min, physical max, samples per 1 s record) of the Xmuse Lab exports in data/01
+EDF_SIGNALS = (
+    [(f"eeg-ch{i}", "uV", 0.0, 1650.0, 256) for i in range(1, 7)]
+    + [(f"gyro-gyro{i}", "deg/s", -1000.0, 1000.0, 53) for i in range(1, 4)]
+    + [(f"acc-acc{i}", "g", -4.0, 4.0, 53) for i in range(1, 4)]
+    + [(f"ppg-{name}", "mA", 0.0, 1073741.0, 64) for name in ("ambient", "ir", "red")]
+    + [("EDF Annotations", "", -1.0, 1.0, 57)]
+)
+
+
+def synthetic_edf(path: Path, minutes: float, seed: int = 0) -> Path:
+    """EDF+C file shaped like the Xmuse Lab exports: 1 s records, random-walk 16-bit samples."""
+    rng = np.random.default_rng(seed)
+    n_records = max(1, int(minutes * 60))
+    n_signals = len(EDF_SIGNALS)
+
+    def pad(value: Any, width: int) -> bytes:
+        return str(value).encode("latin-1").ljust(width)[:width]
+
+    header = b"".join(
+        [pad(0, 8), pad("X X X X", 80), pad("Startdate 01-JAN-2025 X X X", 80), pad("01.01.25", 8), pad("00.00.00", 8)]
+        + [pad(256 * (n_signals + 1), 8), pad("EDF+C", 44), pad(n_records, 8), pad(1, 8), pad(n_signals, 4)]
+    )
+    columns = [
+        [label for label, *_ in EDF_SIGNALS],
+        [""] * n_signals,
+        [unit for _, unit, *_ in EDF_SIGNALS],
+        [phys_min for _, _, phys_min, *_ in EDF_SIGNALS],
+        [phys_max for _, _, _, phys_max, _ in EDF_SIGNALS],
+        [-32768] * n_signals,
+        [32767] * n_signals,
+        [""] * n_signals,
+        [samples for *_, samples in EDF_SIGNALS],
+        [""] * n_signals,
+    ]
+    widths = [16, 80, 8, 8, 8, 8, 8, 80, 8, 32]
+    header += b"".join(pad(value, width) for values, width in zip(columns, widths) for value in values)
+
+    with open(path, "wb") as f:
+        f.write(header)
+        for start in range(0, n_records, 600):
+            stop = min(start + 600, n_records)
+            parts = []
+            for label, _, _, _, samples in EDF_SIGNALS:
+                if label == "EDF Annotations":
+                    tal = np.zeros((stop - start, samples * 2), dtype=np.uint8)
+                    for i, record in enumerate(range(start, stop)):
+                        stamp = f"+{record}\x14\x14\x00".encode("latin-1")
+                        tal[i, : len(stamp)] = np.frombuffer(stamp, dtype=np.uint8)
+                    parts.append(tal.view("<i2"))
+                else:
+                    walk = np.cumsum(rng.integers(-200, 201, (stop - start) * samples))
+                    parts.append(np.clip(walk, -32768, 32767).astype("<i2").reshape(stop - start, samples))
+            f.write(np.concatenate(parts, axis=1).tobytes())
+    return path
+
+
+def legacy_apply_filters(df: pd.DataFrame, channels: list[str], cfg: dict[str, Any], fs: float) -> pd.DataFrame:
+    """Pre-SOS reference: per channel, redesign and run three (b, a) ``filtfilt`` passes."""
+    from scipy.signal import butter, filtfilt
+
+    def butter_filter(data: np.ndarray, cutoff: Any, btype: str, order: int = 5) -> np.ndarray:
+        b, a = butter(order, np.asarray(cutoff) / (0.5 * fs), btype=btype, analog=False)
+        return filtfilt(b, a, data)
+
+    filtered = df.copy()
+    for channel in channels:
+        signal = pd.to_numeric(filtered[channel], errors="coerce").interpolate("linear").bfill().ffill()
+        values = signal.to_numpy()
+        values = butter_filter(values, cfg["highpass_hz"], "high")
+        values = butter_filter(values, cfg["lowpass_hz"], "low")
+        values = butter_filter(values, cfg["notch_hz"], "bandstop")
+        filtered[channel] = values
+    return filtered
+
+
+def legacy_interpolate_outliers(df: pd.DataFrame, channels: list[str], threshold: float) -> tuple[pd.DataFrame, int]:
+    """Pre-numpy reference: per channel ``pd.to_numeric``, boolean Series and pandas ``interpolate``."""
+    fixed = df.copy()
+    total = 0
+    for channel in channels:
+        if channel not in fixed.columns:
+            continue
+        signal = pd.to_numeric(fixed[channel], errors="coerce")
+        bad = signal.abs() > threshold
+        total += int(bad.sum())
+        if bad.any():
+            signal.loc[bad] = np.nan
+            fixed[channel] = signal.interpolate("linear", limit_direction="both")
+    return fixed, total
+
+
+def legacy_de_features(epochs: Any, channels: list[str], bands: dict[str, Any], order: int = 5) -> pd.DataFrame:
+    """06_05 before the batched engine: a fresh ``butter`` + ``filtfilt`` per epoch, channel and band."""
+    from scipy.signal import butter, filtfilt
+
+    nyq = 0.5 * epochs.fs
+    results = []
+    for epoch_id, epoch_df in epochs.iter_frames():
+        row: dict[str, Any] = {"epoch_id": epoch_id}
+        for chan in channels:
+            if chan in epoch_df.columns and not epoch_df[chan].isnull().all():
+                signal = epoch_df[chan].dropna().values
+                for name, (low, high) in bands.items():
+                    if len(signal) <= 3 * order:
+                        filtered = np.zeros_like(signal)
+                    else:
+                        b, a = butter(order, [low / nyq, high / nyq], btype="band")
+                        filtered = filtfilt(b, a, signal)
+                    var = np.var(filtered, ddof=1)
+                    row[f"{chan}_{name}"] = 0.5 * np.log(2 * np.pi * np.exp(1) * var) if var > 0 else 0
+        results.append(row)
+    return pd.DataFrame(results)
+
+
+def legacy_organize_direct(path: Path) -> dict[str, pd.DataFrame]:
+    """Pre-parser reference: ``read_csv``, groupby PacketType, ``str.split`` the Data column, ``to_numeric``."""
+    df = pd.read_csv(path)
+    frames = {}
+    for packet_type, group in df.groupby("PacketType"):
+        split_data = group["Data"].astype(str).str.replace('"', "", regex=False).str.split(",", expand=True)
+        split_data.columns = [f"data_{i + 1}" for i in range(split_data.shape[1])]
+        split_data = split_data.apply(pd.to_numeric, errors="coerce")
+        frames[packet_type] = pd.concat(
+            [group[["Timestamp"]].reset_index(drop=True), split_data.reset_index(drop=True)], axis=1
+        )
+    return frames
+
+
+def best_of(func: Callable[[], Any], repeat: int, warmup: bool = False) -> float:
+    """Fastest of ``repeat`` timed calls; ``warmup`` makes one untimed call first (imports, filter design caches)."""
+    if warmup:
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_filters(minutes: float, repeat: int) -> list[dict[str, Any]]:
+    """Filter chain: the legacy whole-column loop against ``apply_filters`` per design and mode.
+
+    The toolkit filters each gap-free segment on its own, so the diffs compare with the legacy
+    filter run segment by segment; the timing is the legacy code as it was, over whole columns.
+    """
+    rows = []
+    for n_channels in (4, 6):
+        df, fs = synthetic_cleaned(n_channels, minutes)
+        segments = xt.gap_index(df["time"].to_numpy())
+        channels = [f"CH{i + 1}" for i in range(n_channels)]
+        sos_cfg = {**FILTER_CFG, "filter_design": "sos"}
+        fused_cfg = {**FILTER_CFG, "filter_mode": "fused"}
+        legacy = best_of(lambda: legacy_apply_filters(df, channels, FILTER_CFG, fs), repeat, warmup=True)
+        current = best_of(lambda: xt.apply_filters(df, channels, FILTER_CFG, fs), repeat, warmup=True)
+        sos = best_of(lambda: xt.apply_filters(df, channels, sos_cfg, fs), repeat, warmup=True)
+        fused = best_of(lambda: xt.apply_filters(df, channels, fused_cfg, fs), repeat, warmup=True)
+        reference = np.vstack(
+            [legacy_apply_filters(df.iloc[start:stop], channels, FILTER_CFG, fs)[channels].to_numpy() for start, stop in segments]
+        )
+        diff = np.abs(reference - xt.apply_filters(df, channels, FILTER_CFG, fs)[channels].to_numpy()).max()
+        sos_diff = np.abs(reference - xt.apply_filters(df, channels, sos_cfg, fs)[channels].to_numpy()).max()
+        rows.append(
+            {
+                "channels": n_channels,
+                "samples": len(df),
+                "segments": len(segments),
+                "legacy_s": round(legacy, 4),
+                "ba_s": round(current, 4),
+                "sos_s": round(sos, 4),
+                "fused_s": round(fused, 4),
+                "speedup": round(legacy / current, 2),
+                "sos_speedup": round(legacy / sos, 2),
+                "fused_speedup": round(legacy / fused, 2),
+                "max_abs_diff": float(diff),
+                "sos_max_abs_diff": float(sos_diff),
+            }
+        )
+    return rows
+
+
+def bench_csv(files: list[Path], repeat: int) -> list[dict[str, Any]]:
+    """Parse throughput of the old all-columns reader against the pruned, typed reader per engine."""
+    engines = ["c"]
+    if _csv_engine("auto") == "pyarrow":
+        engines.append("pyarrow")
+    rows = []
+    for path in files:
+        size_mb = path.stat().st_size / (1024 * 1024)
+        cases = {"all_columns": lambda: pd.read_csv(path, na_values=[""], low_memory=False)}
+        for engine in engines:
+            cases[f"raw_columns_{engine}"] = lambda engine=engine: xt.read_raw_csv(path, RAW_COLUMNS, engine, report=False)
+        for name, func in cases.items():
+            seconds = best_of(func, repeat)
+            rows.append(
+                {"file": path.name, "size_mb": round(size_mb, 1), "reader": name, "seconds": round(seconds, 4), "mb_per_s": round(size_mb / seconds, 1)}
+            )
+    return rows
+
+
+def bench_direct(files: list[Path], repeat: int, chunk_mb: float = 8.0) -> list[dict[str, Any]]:
+    """Muse Direct split: pandas groupby/str.split against the byte parser, whole file and block-wise.
+
+    ``peak_mb`` is the tracemalloc peak of one run. The blocks cases only parse, as the writers do;
+    ``csv_split`` is the text copy behind csv output, without number conversion.
+    """
+    chunk_bytes = int(chunk_mb * 1024 * 1024)
+    rows = []
+    for path in files:
+        size_mb = path.stat().st_size / (1024 * 1024)
+        reference = legacy_organize_direct(path)
+        cases = {
+            "pandas": lambda: legacy_organize_direct(path),
+            "parser": lambda: xt.read_direct_csv(path),
+            f"parser_{chunk_mb:g}mb_blocks": lambda: sum(1 for _ in xt.iter_direct_blocks(path, chunk_bytes)),
+            f"csv_split_{chunk_mb:g}mb_blocks": lambda: sum(
+                len(xt.split_direct_block(block)) for block in _direct_lines(path, chunk_bytes)
+            ),
+        }
+        for name, func in cases.items():
+            seconds = best_of(func, repeat)
+            tracemalloc.start()
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+            row = {"file": path.name, "size_mb": round(size_mb, 1), "reader": name, "seconds": round(seconds, 4)}
+            row.update({"mb_per_s": round(size_mb / seconds, 1), "peak_mb": round(peak, 1)})
+            if isinstance(result, dict):
+                # pandas' to_numeric is not always correctly rounded: up to 1 ulp apart
+                row["max_rel_diff"] = max(
+                    float(np.nanmax(np.abs(frame.to_numpy(float) - ref) / np.maximum(np.abs(ref), 1.0), initial=0.0))
+                    for t, frame in result.items()
+                    for ref in [reference[t].to_numpy(float)]
+                )
+            rows.append(row)
+    return rows
+
+
+def _edf_case(reader: str, edf_path: Path, output_format: str, output_dir: Path) -> None:
+    if reader == "imports_only":
+        import scipy.signal  # noqa: F401
+    elif reader == "mne_preload":
+        xt.edf_to_csv(edf_path, output_dir, output_format, reader="mne")
+    elif reader == "edf_reader_whole":
+        xt.edf_to_csv(edf_path, output_dir, output_format, chunk_sec=0)
+    elif reader == "edf_reader_300s":
+        xt.edf_to_csv(edf_path, output_dir, output_format)
+
+
+def _mat_case(mat_format: str, csv_path: Path, output_dir: Path) -> None:
+    xt.csv_to_mat(csv_path, output_dir, mat_format)
+
+
+def _timed_case(case: Callable[..., None], *args: Any) -> tuple[float, float | None]:
+    """Run ``case`` quietly: seconds and the process's peak RSS (MB)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        case(*args)
+    return time.perf_counter() - start, xt.peak_rss_mb()
+
+
+def fresh_process_runs(case: Callable[..., None], args: tuple[Any, ...], repeat: int) -> tuple[float, float]:
+    """Best seconds and highest peak RSS of ``repeat`` runs, each in a new process (own peak RSS).
+
+    ``case`` gets a fresh temporary output directory as its last argument.
+    """
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(1, mp_context=context) as pool:
+            runs.append(pool.submit(_timed_case, case, *args, Path(tmp_dir)).result())
+    return min(run[0] for run in runs), max(run[1] or 0.0 for run in runs)
+
+
+def bench_edf(files: list[Path], repeat: int) -> list[dict[str, Any]]:
+    """EDF conversion: mne ``preload=True`` against ``EdfReader`` whole-file and in 300 s blocks.
+
+    Every run is a fresh process, so ``peak_rss_mb`` is that conversion's own peak; ``imports_only``
+    is the pandas/scipy baseline included in it. Output is parquet when pyarrow is installed, else csv.
+    """
+    output_format = "parquet" if _csv_engine("auto") == "pyarrow" else "csv"
+    readers = ["imports_only", "edf_reader_300s", "edf_reader_whole"]
+    try:
+        import mne  # noqa: F401
+
+        readers.insert(1, "mne_preload")
+    except ImportError:
+        print("[bench] mne is not installed: skipping the mne_preload reference")
+
+    rows = []
+    for path in files:
+        n_records = xt.EdfReader(path).n_records
+        for reader in readers:
+            seconds, rss = fresh_process_runs(_edf_case, (reader, path, output_format), repeat)
+            row = {"file": path.name, "records": n_records, "reader": reader, "format": output_format}
+            row.update({"seconds": round(seconds, 4), "peak_rss_mb": round(rss, 1)})
+            if reader != "imports_only":
+                row["records_per_s"] = round(n_records / seconds, 1)
+            rows.append(row)
+    return rows
+
+
+def bench_mat(files: list[Path], repeat: int) -> list[dict[str, Any]]:
+    """``csv_to_mat``: whole-table ``savemat`` (v5) against chunked HDF5 (v7.3), each in a fresh process."""
+    rows = []
+    for path in files:
+        size_mb = path.stat().st_size / (1024 * 1024)
+        for mat_format in xt.MAT_FORMATS:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    xt.csv_to_mat(path, Path(tmp_dir), mat_format)
+                mat_mb = (Path(tmp_dir) / f"{path.stem}.mat").stat().st_size / (1024 * 1024)
+            seconds, rss = fresh_process_runs(_mat_case, (mat_format, path), repeat)
+            row = {"file": path.name, "size_mb": round(size_mb, 1), "reader": f"mat_{mat_format}"}
+            row.update({"seconds": round(seconds, 4), "mb_per_s": round(size_mb / seconds, 1)})
+            row.update({"mat_mb": round(mat_mb, 1), "peak_rss_mb": round(rss, 1)})
+            rows.append(row)
+    return rows
+
+
+def bench_seek(files: list[Path], repeat: int, window_sec: float = 10.0, windows: int = 20) -> list[dict[str, Any]]:
+    """Reading ``windows`` random ``window_sec`` windows of a raw CSV: parse the CSV (or copy the whole
+    ingested store) and slice, against ``Recording.read`` on the store.
+
+    ``seconds`` is per window; the full-load cases do one load per window, as a viewer
+    opening the file for each event does.
+    """
+    rows = []
+    for path in files:
+        size_mb = path.stat().st_size / (1024 * 1024)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with contextlib.redirect_stdout(io.StringIO()):
+                store = xt.RecordingStore.open(xt.ingest_csv(path, Path(tmp_dir), RAW_COLUMNS))
+            duration = float(store.time[-1])
+            starts = np.random.default_rng(0).uniform(0.0, max(duration - window_sec, 0.0), windows)
+            channels = store.channels
+
+            def csv_window(t_start: float) -> np.ndarray:
+                df = xt.clean_eeg_frame(xt.read_raw_csv(path, RAW_COLUMNS, report=False), RAW_COLUMNS)
+                times = df["time"].to_numpy()
+                return df.loc[(times >= t_start) & (times < t_start + window_sec), channels].to_numpy(np.float32)
+
+            def store_window(t_start: float) -> np.ndarray:
+                df = xt.RecordingStore.open(store.path).to_frame()
+                times = df["time"].to_numpy()
+                return df.loc[(times >= t_start) & (times < t_start + window_sec), channels].to_numpy(np.float32)
+
+            def read_window(t_start: float) -> np.ndarray:
+                return xt.Recording.read(store.path, t_start, t_start + window_sec, dtype=np.float32).data
+
+            cases = {
+                "csv_full_load": (csv_window, starts[:2]),
+                "store_full_load": (store_window, starts[:5]),
+                "recording_read": (read_window, starts),
+            }
+            for name, (func, points) in cases.items():
+                seconds = best_of(lambda: [func(t) for t in points], repeat) / len(points)
+                diff = max(float(np.abs(func(t) - read_window(t)).max(initial=0.0)) for t in points)
+                row = {"file": path.name, "size_mb": round(size_mb, 1), "duration_min": round(duration / 60, 1), "reader": name}
+                row.update({"window_sec": window_sec, "seconds": round(seconds, 6), "windows_per_s": round(1 / seconds, 1), "max_abs_diff": diff})
+                rows.append(row)
+    return rows
+
+
+def bench_de(minutes: float, repeat: int, window_sec: float = 2.0, overlap_rate: float = 0.5) -> list[dict[str, Any]]:
+    """DE features of 06_05: the per-epoch loop against ``de_features`` (``de_matrix``) on the same epochs.
+
+    ``max_abs_diff`` compares the batched ``sos=False`` (b, a) table with the loop; ``sos_max_abs_diff``
+    is how far the default second-order-sections table is from it in the worst band (delta, see ``de_matrix``).
+    """
+    rows = []
+    for n_channels in (4, 6):
+        channels = [f"CH{i + 1}" for i in range(n_channels)]
+        rec = xt.Recording.from_frame(synthetic_filtered(n_channels, minutes)[0], channels)
+        epochs = xt.Epochs.from_continuous(rec, rec.fs, window_sec, overlap_rate)
+        legacy = best_of(lambda: legacy_de_features(epochs, channels, xt.DE_BANDS), 1)
+        batched = best_of(lambda: xt.de_features(epochs, channels, sos=False), repeat)
+        sos = best_of(lambda: xt.de_features(epochs, channels), repeat)
+        expected = legacy_de_features(epochs, channels, xt.DE_BANDS)
+        result = xt.de_features(epochs, channels, sos=False)
+        result_sos = xt.de_features(epochs, channels)
+        rows.append(
+            {
+                "channels": n_channels,
+                "epochs": len(epochs),
+                "filter_passes_legacy": len(epochs) * n_channels * len(xt.DE_BANDS),
+                "legacy_s": round(legacy, 4),
+                "batched_s": round(batched, 4),
+                "batched_sos_s": round(sos, 4),
+                "speedup": round(legacy / batched, 1),
+                "max_abs_diff": float(np.abs(expected[result.columns].to_numpy() - result.to_numpy()).max()),
+                "sos_max_abs_diff": float(np.abs(result_sos.to_numpy() - result.to_numpy()).max()),
+            }
+        )
+    return rows
+
+
+def bench_outliers(minutes: float, repeat: int, threshold: float = 100.0) -> list[dict[str, Any]]:
+    """Outlier repair: legacy pandas loop vs the numpy version on a frame and in place on a Recording."""
+    rows = []
+    for n_channels in (4, 6):
+        df = synthetic_filtered(n_channels, minutes, spike_rate=0.005)[0]
+        channels = [f"CH{i + 1}" for i in range(n_channels)]
+        rec = xt.Recording.from_frame(df, channels)
+        legacy = best_of(lambda: legacy_interpolate_outliers(df, channels, threshold), repeat)
+        frame = best_of(lambda: xt.interpolate_outliers(df, channels, threshold), repeat)
+        inplace = best_of(lambda: xt.interpolate_outliers(rec.copy(), channels, threshold, inplace=True), repeat)
+        copy_cost = best_of(rec.copy, repeat)
+        expected, total = legacy_interpolate_outliers(df, channels, threshold)
+        result, counts, mask = xt.interpolate_outliers(df, channels, threshold)
+        rows.append(
+            {
+                "channels": n_channels,
+                "samples": len(df),
+                "bad_samples": total,
+                "legacy_s": round(legacy, 4),
+                "numpy_frame_s": round(frame, 4),
+                "numpy_inplace_s": round(inplace - copy_cost, 4),
+                "speedup_frame": round(legacy / frame, 1),
+                "speedup_inplace": round(legacy / max(inplace - copy_cost, 1e-9), 1),
+                "same_counts": total == sum(counts.values()) == int(mask.sum()),
+                "max_abs_diff": float(np.abs(expected[channels].to_numpy() - result[channels].to_numpy()).max()),
+            }
+        )
+    return rows
+
+
+def _preprocess_in_memory(path: Path, cfg: dict[str, Any]) -> tuple[Any, Any]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        rec, meta = xt.run_preprocess_stages(path, cfg)
+    epoch_cfg = cfg["epoch"]
+    epochs = xt.Epochs.from_continuous(rec, rec.fs, float(epoch_cfg["window_sec"]), float(epoch_cfg["overlap_rate"]))
+    return rec, epochs
+
+
+def bench_precision(files: list[Path], repeat: int) -> list[dict[str, Any]]:
+    """Validation of ``precision: float32`` against the float64 path on the same recordings.
+
+    Deviations are in z-scored units (the output of ``run_preprocess``); peak memory is what
+    tracemalloc sees during clean -> scale -> epoch.
+    """
+    base_cfg = xt.load_config()["preprocess"]
+    rows = []
+    for path in files:
+        runs = {}
+        for precision in ("float64", "float32"):
+            cfg = {**base_cfg, "precision": precision}
+            seconds = best_of(lambda: _preprocess_in_memory(path, cfg), repeat)
+            tracemalloc.start()
+            rec, epochs = _preprocess_in_memory(path, cfg)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            runs[precision] = (rec, epochs, seconds, peak)
+
+        rec64, epochs64, seconds64, peak64 = runs["float64"]
+        rec32, epochs32, seconds32, peak32 = runs["float32"]
+        deviation = np.abs(rec32.data.astype(np.float64) - rec64.data)
+        outliers = [entry["fixed"] for rec in (rec64, rec32) for entry in rec.log if entry["stage"] == "outliers"]
+        rows.append(
+            {
+                "file": path.name,
+                "samples": len(rec64),
+                "max_abs_dev": float(np.nanmax(deviation)),
+                "mean_abs_dev": float(np.nanmean(deviation)),
+                "epoch_max_abs_dev": float(np.nanmax(np.abs(epochs32.values.astype(np.float64) - epochs64.values))),
+                "epoch_dtype": str(epochs32.values.dtype),
+                "outliers_f64/f32": f"{outliers[0]}/{outliers[1]}",
+                "f64_s": round(seconds64, 3),
+                "f32_s": round(seconds32, 3),
+                "f64_peak_mb": round(peak64 / 2**20, 1),
+                "f32_peak_mb": round(peak32 / 2**20, 1),
+            }
+        )
+    return rows
+
+
+def _suite_config(n_channels: int) -> dict[str, Any]:
+    cfg = json.loads(json.dumps(xt.load_config()["preprocess"]))
+    cfg["raw_columns"] = {"timestamps": "time", **{f"eeg_{i + 1}": f"CH{i + 1}" for i in range(n_channels)}}
+    cfg["channels"] = [f"CH{i + 1}" for i in range(n_channels)]
+    cfg["cache"] = {"dir": ""}
+    return cfg
+
+
+def _time_inplace(func: Callable[[Any], Any], rec: Any, repeat: int) -> float:
+    """Best time of ``func`` on a fresh copy of ``rec``, minus the cost of the copy."""
+    return max(best_of(lambda: func(rec.copy()), repeat) - best_of(rec.copy, repeat), 1e-9)
+
+
+def _run_preprocess_once(cfg: dict[str, Any], tmp_dir: Path) -> None:
+    config = xt.load_config()
+    config["jobs"] = 1
+    config["paths"] = {**config["paths"], "preprocess_input_dir": str(tmp_dir), "output_dir": str(tmp_dir / "out")}
+    config["preprocess"] = {**cfg, "files": ["synthetic.csv"]}
+    config["catalog"] = {"path": ""}  # temporary inputs do not belong in the catalog
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = xt.run_preprocess(config)
+    if summary["failed"]:
+        raise RuntimeError(f"run_preprocess failed: {summary['failures']}")
+
+
+def bench_suite(
+    durations: list[float], channel_counts: list[int], repeat: int, legacy: bool = False, full: bool = True
+) -> list[dict[str, Any]]:
+    """Throughput of every preprocess stage function and the whole ``run_preprocess``.
+
+    For each channel count and duration a ``synthetic_recording`` is built once. The stages run in
+    pipeline order on the output of the stage before, as DataFrames (``frame``) and in place on a
+    ``Recording`` (``recording``); ``legacy`` adds the pre-optimisation filter and outlier
+    references. ``run_preprocess`` includes reading the raw CSV and writing every output.
+    """
+    rows = []
+    for n_channels in channel_counts:
+        cfg = _suite_config(n_channels)
+        channels = cfg["channels"]
+        raw_columns = cfg["raw_columns"]
+        threshold = float(cfg["amplitude_threshold"])
+        for minutes in durations:
+            raw = synthetic_recording(n_channels, minutes)
+            cleaned = xt.clean_eeg_frame(raw, raw_columns)
+            fs = xt.get_sampling_rate(cleaned)
+            based = xt.apply_baseline(cleaned, channels, cfg["baseline_window_sec"], fs)
+            filtered = xt.apply_filters(based, channels, cfg, fs)
+            fixed = xt.interpolate_outliers(filtered, channels, threshold)[0]
+            scaled = xt.scale_channels(fixed, channels, cfg["scale_method"])
+            raw_rec = xt.Recording.from_raw(raw, raw_columns)
+            based_rec, filtered_rec, fixed_rec, scaled_rec = (
+                xt.Recording.from_frame(frame, channels, fs) for frame in (based, filtered, fixed, scaled)
+            )
+            window_sec, overlap = float(cfg["epoch"]["window_sec"]), float(cfg["epoch"]["overlap_rate"])
+
+            cases: dict[tuple[str, str], Callable[[], float]] = {
+                ("clean_eeg_frame", "frame"): lambda: best_of(lambda: xt.clean_eeg_frame(raw, raw_columns), repeat),
+                ("clean_eeg_frame", "recording"): lambda: _time_inplace(
+                    lambda rec: xt.clean_eeg_frame(rec, raw_columns, inplace=True), raw_rec, repeat
+                ),
+                ("apply_baseline", "frame"): lambda: best_of(
+                    lambda: xt.apply_baseline(cleaned, channels, cfg["baseline_window_sec"], fs), repeat
+                ),
+                ("apply_baseline", "recording"): lambda: _time_inplace(
+                    lambda rec: xt.apply_baseline(rec, channels, cfg["baseline_window_sec"], fs, inplace=True),
+                    xt.Recording.from_frame(cleaned, channels, fs),
+                    repeat,
+                ),
+                ("apply_filters", "frame"): lambda: best_of(lambda: xt.apply_filters(based, channels, cfg, fs), repeat),
+                ("apply_filters", "recording"): lambda: _time_inplace(
+                    lambda rec: xt.apply_filters(rec, channels, cfg, fs, inplace=True), based_rec, repeat
+                ),
+                ("interpolate_outliers", "frame"): lambda: best_of(
+                    lambda: xt.interpolate_outliers(filtered, channels, threshold), repeat
+                ),
+                ("interpolate_outliers", "recording"): lambda: _time_inplace(
+                    lambda rec: xt.interpolate_outliers(rec, channels, threshold, inplace=True), filtered_rec, repeat
+                ),
+                ("scale_channels", "frame"): lambda: best_of(
+                    lambda: xt.scale_channels(fixed, channels, cfg["scale_method"]), repeat
+                ),
+                ("scale_channels", "recording"): lambda: _time_inplace(
+                    lambda rec: xt.scale_channels(rec, channels, cfg["scale_method"], inplace=True), fixed_rec, repeat
+                ),
+                ("create_epochs", "frame"): lambda: best_of(
+                    lambda: xt.create_epochs(scaled, fs, window_sec, overlap), repeat
+                ),
+                ("create_epochs", "epochs_view"): lambda: best_of(
+                    lambda: xt.Epochs.from_continuous(scaled_rec, fs, window_sec, overlap), repeat
+                ),
+            }
+            if legacy:
+                cases[("apply_filters", "legacy")] = lambda: best_of(
+                    lambda: legacy_apply_filters(based, channels, cfg, fs), repeat
+                )
+                cases[("interpolate_outliers", "legacy")] = lambda: best_of(
+                    lambda: legacy_interpolate_outliers(filtered, channels, threshold), repeat
+                )
+            if full:
+                def full_run() -> float:
+                    with tempfile.TemporaryDirectory() as tmp_dir:
+                        raw.to_csv(Path(tmp_dir) / "synthetic.csv", index=False)
+                        return best_of(lambda: _run_preprocess_once(cfg, Path(tmp_dir)), repeat)
+
+                cases[("run_preprocess", "csv")] = full_run
+
+            for (function, variant), timed in cases.items():
+                seconds = timed()
+                rows.append(
+                    {
+                        "function": function,
+                        "variant": variant,
+                        "channels": n_channels,
+                        "minutes": minutes,
+                        "samples": len(raw),
+                        "seconds": round(seconds, 5),
+                        "msamples_per_s": round(len(raw) / seconds / 1e6, 2),
+                        "mb_per_s": round(len(raw) * n_channels * 8 / seconds / 2**20, 1),
+                    }
+                )
+            del raw, cleaned, based, filtered, fixed, scaled, raw_rec, based_rec, filtered_rec, fixed_rec, scaled_rec
+    return rows
+
+
+def compare_rows(
+    rows: list[dict[str, Any]], baseline_path: Path, tolerance: float, min_seconds: float = 0.01
+) -> list[dict[str, Any]]:
+    """Add ``vs_baseline`` (time / baseline time) to rows also in a previous ``--json`` report.
+
+    Returns the regressions; cases under ``min_seconds`` are compared but too noisy to flag.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        previous = json.load(f)["rows"]
+    def key(row: dict[str, Any]) -> tuple[Any, ...]:
+        return tuple(row.get(field) for field in ("function", "variant", "channels", "minutes", "file", "reader"))
+
+    before = {key(row): row for row in previous if "seconds" in row}
+    regressions = []
+    for row in rows:
+        old = before.get(key(row))
+        if old is None or "seconds" not in row or not old["seconds"]:
+            continue
+        row["vs_baseline"] = round(row["seconds"] / old["seconds"], 2)
+        if row["vs_baseline"] > 1 + tolerance and row["seconds"] >= min_seconds:
+            regressions.append(row)
+    return regressions
+
+
+def write_report(rows: list[dict[str, Any]], path: Path, bench: str) -> None:
+    """JSON report with the environment, so runs on different machines/versions can be told apart."""
+    import scipy
+
+    report = {
+        "bench": bench,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "rows": rows,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="XMuse toolkit benchmarks")
+    parser.add_argument(
+        "bench",
+        choices=["suite", "filters", "csv", "direct", "edf", "mat", "seek", "de", "precision", "outliers"],
+        help="benchmark to run",
+    )
+    parser.add_argument("--minutes", type=float, default=30.0, help="synthetic recording length")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, best time is reported")
+    parser.add_argument(
+        "--files", nargs="*", default=None, help="inputs of the csv/direct/edf/mat/seek/precision benches (default: synthetic)"
+    )
+    parser.add_argument(
+        "--durations", type=float, nargs="+", default=[1.0, 10.0, 60.0], help="suite: recording lengths in minutes (up to 720)"
+    )
+    parser.add_argument("--channels", type=int, nargs="+", default=[4, 6], help="suite: channel counts")
+    parser.add_argument("--legacy", action="store_true", help="suite: also time the pre-optimisation references")
+    parser.add_argument("--no-full", action="store_true", help="suite: skip the whole run_preprocess case")
+    parser.add_argument("--json", default=None, help="also write the rows and environment to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON report of an earlier run to compare times against")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="--compare: slowdown ratio above 1 + tolerance is a regression"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.bench == "suite":
+        rows = bench_suite(args.durations, args.channels, args.repeat, args.legacy, not args.no_full)
+    elif args.bench == "filters":
+        rows = bench_filters(args.minutes, args.repeat)
+    elif args.bench == "outliers":
+        rows = bench_outliers(args.minutes, args.repeat)
+    elif args.bench == "de":
+        rows = bench_de(args.minutes, args.repeat)
+    elif args.bench in ("direct", "edf", "mat"):
+        bench, synthetic, suffix = {
+            "direct": (bench_direct, synthetic_direct_csv, ".csv"),
+            "edf": (bench_edf, synthetic_edf, ".edf"),
+            "mat": (bench_mat, synthetic_table_csv, ".csv"),
+        }[args.bench]
+        if args.files:
+            rows = bench([Path(f) for f in args.files], args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                rows = bench([synthetic(Path(tmp_dir) / f"synthetic_{args.bench}{suffix}", args.minutes)], args.repeat)
+    else:
+        bench = {"csv": bench_csv, "seek": bench_seek}.get(args.bench, bench_precision)
+        if args.files:
+            rows = bench([Path(f) for f in args.files], args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                rows = bench([synthetic_raw_csv(Path(tmp_dir) / "synthetic_raw.csv", args.minutes)], args.repeat)
+    regressions = compare_rows(rows, Path(args.compare), args.tolerance) if args.compare else []
+    print(pd.DataFrame(rows).to_string(index=False))
+    if args.json:
+        write_report(rows, Path(args.json), args.bench)
+        print(f"report saved: {args.json}")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than {1 + args.tolerance:.2f}x the baseline:")
+        print(pd.DataFrame(regressions).to_string(index=False))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
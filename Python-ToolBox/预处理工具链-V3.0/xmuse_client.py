@@ -0,0 +1,138 @@
+"""Client of ``xmuse_toolkit.py serve``.
+只用标准库，不导入pandas/scipy，启动只需几十毫秒；实验室软件每处理一个文件就调用一次
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CONFIG = ROOT / "config.json"
+JOB_COMMANDS = ("preprocess", "ingest", "direct", "convert")
+
+
+def project_path(path_value: str | Path) -> Path:
+    path = Path(path_value)
+    return path if path.is_absolute() else ROOT / path
+
+
+def resolve_transport(
+    config: dict[str, Any], socket_path: str | None = None, spool_dir: str | None = None
+) -> tuple[str, Path]:
+    """CLI ``--spool``/``--socket`` win over ``serve.*``; UNIX sockets are the default where available."""
+    serve_cfg = config.get("serve", {})
+    if spool_dir:
+        return "spool", project_path(spool_dir)
+    if socket_path:
+        return "socket", project_path(socket_path)
+    if hasattr(socket, "AF_UNIX"):
+        return "socket", project_path(serve_cfg.get("socket", "output/serve.sock"))
+    return "spool", project_path(serve_cfg.get("spool_dir", "output/spool"))
+
+
+def submit_job(
+    job: dict[str, Any],
+    socket_path: Path | None = None,
+    spool_dir: Path | None = None,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    """Send one job to a running ``serve`` and wait for its response; adds the round trip as ``client_s``."""
+    started = time.perf_counter()
+    job = {"id": f"{os.getpid()}-{time.time_ns()}", **job}
+    if socket_path is not None:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(job).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError(f"no response from {socket_path}")
+        response = json.loads(line)
+    else:
+        if spool_dir is None:
+            raise ValueError("either socket_path or spool_dir is required")
+        incoming, done = spool_dir / "incoming", spool_dir / "done"
+        incoming.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=incoming, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_name, incoming / f"{job['id']}.json")
+        result_path = done / f"{job['id']}.json"
+        while not result_path.exists():
+            if timeout is not None and time.perf_counter() - started > timeout:
+                raise TimeoutError(f"no result for job {job['id']} after {timeout}s")
+            time.sleep(0.05)
+        with open(result_path, encoding="utf-8") as f:
+            response = json.load(f)
+        result_path.unlink()
+    response["client_s"] = time.perf_counter() - started
+    return response
+
+
+def run_submit(
+    config_path: str | Path,
+    command: str,
+    files: list[str],
+    options: dict[str, Any],
+    socket_path: str | None = None,
+    spool_dir: str | None = None,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    """Submit one job, print the server log and a timing line; returns the response."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        kind, location = resolve_transport(json.load(f), socket_path, spool_dir)
+    # paths are resolved here: the server runs in another working directory
+    files = [str(Path(name).resolve()) if Path(name).parent != Path(".") else name for name in files]
+    job = {"command": command, "config": str(Path(config_path).resolve()), "files": files, "options": options}
+    if kind == "socket":
+        response = submit_job(job, socket_path=location, timeout=timeout)
+    else:
+        response = submit_job(job, spool_dir=location, timeout=timeout)
+    if command == "ping":
+        print(
+            f"[submit] server up: {response['workers']} workers, {response['jobs_done']} jobs done, "
+            f"uptime {response['uptime_s']:.0f}s; round trip {response['client_s'] * 1000:.1f} ms"
+        )
+        return response
+    print(response.get("log", ""), end="")
+    status = "ok" if response["ok"] else f"failed: {response.get('error', '')}"
+    print(
+        f"[submit] {command} {status}; total {response['client_s']:.2f}s "
+        f"(queue {response.get('queue_s', 0.0):.2f}s, run {response.get('run_s', 0.0):.2f}s)"
+    )
+    return response
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Submit one job to a running xmuse_toolkit.py serve")
+    parser.add_argument("job", choices=[*JOB_COMMANDS, "ping"], help="command the server runs (ping checks that it is up)")
+    parser.add_argument("files", nargs="*", help="files of the job (default: the config's list)")
+    parser.add_argument("--config", default=str(DEFAULT_CONFIG), help="config json path")
+    parser.add_argument("--socket", default=None, help="UNIX socket path (overrides serve.socket)")
+    parser.add_argument("--spool", default=None, help="use this spool directory instead of a socket")
+    parser.add_argument("--stream", action="store_true", help="preprocess: bounded-memory mode")
+    parser.add_argument("--cache-dir", default=None, help="preprocess: stage cache directory")
+    parser.add_argument("--profile", action="store_true", help="preprocess: dump cProfile stats per stage")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds to wait for the result")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    options = {"stream": args.stream, "cache_dir": args.cache_dir, "profile": args.profile}
+    response = run_submit(args.config, args.job, args.files, options, args.socket, args.spool, args.timeout)
+    sys.exit(0 if response["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()